@@ -0,0 +1,395 @@
+"""Discovery and verification of the ACCELA installer, memoized across runs."""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    ACCELA_CACHE_FILE,
+    ACCELA_CANCEL_GRACE_SECONDS,
+    ACCELA_OUTPUT_RING_LINES,
+)
+from logger import logger
+from paths import backend_path
+from settings import get_setting
+from utils import read_json
+
+
+def find_accela_executable() -> Optional[str]:
+    """Find ACCELA executable using configuration or search strategies."""
+    # First, try to read accela_location from settings.json
+    settings_path = os.path.join(os.path.dirname(__file__), "settings.json")
+    if os.path.exists(settings_path):
+        try:
+            with open(settings_path, "r", encoding="utf-8") as f:
+                settings = json.load(f)
+                accela_path = settings.get("accela_location")
+                if accela_path:
+                    accela_path = accela_path.strip()
+                    if accela_path and os.path.exists(accela_path):
+                        logger.log(
+                            f"Cyberia: Using ACCELA from settings.json: {accela_path}"
+                        )
+                        return accela_path
+                    elif accela_path:
+                        logger.warn(
+                            f"Cyberia: ACCELA path in settings.json not found: {accela_path}"
+                        )
+        except Exception as e:
+            logger.warn(f"Failed to load settings.json: {e}")
+
+    # Fallback to platform-specific search
+    system = platform.system()
+
+    if system == "Windows":
+        # Try PATH first
+        accela_path = shutil.which("ACCELA.exe") or shutil.which("ACCELA")
+        if accela_path:
+            logger.log(f"Cyberia: Found ACCELA in PATH: {accela_path}")
+            return accela_path
+
+        # Try common Windows locations
+        common_paths = [
+            os.path.expandvars(r"%APPDATA%\ACCELA\ACCELA.exe"),
+            os.path.expandvars(r"%LOCALAPPDATA%\ACCELA\ACCELA.exe"),
+            os.path.expandvars(r"%PROGRAMFILES%\ACCELA\ACCELA.exe"),
+            os.path.expandvars(r"%PROGRAMFILES(X86)%\ACCELA\ACCELA.exe"),
+            os.path.expanduser(r"~\Desktop\ACCELA.exe"),
+            os.path.expanduser(r"~\Documents\ACCELA.exe"),
+        ]
+
+        for path in common_paths:
+            if os.path.exists(path):
+                logger.log(f"Cyberia: Found ACCELA at common location: {path}")
+                return path
+    else:
+        # Linux/Mac behavior
+        # Check system-wide location first
+        system_run_sh = "/usr/share/ACCELA/systemrun.sh"
+        if os.path.exists(system_run_sh):
+            logger.log("Cyberia: Found ACCELA systemrun.sh script")
+            return system_run_sh
+
+        # Check user-specific locations
+        accela_home = os.path.expanduser("~/.local/share/ACCELA")
+        run_sh = os.path.join(accela_home, "run.sh")
+        accela_bin = os.path.join(accela_home, "ACCELA")
+        accela_appimage = os.path.join(accela_home, "ACCELA.AppImage")
+
+        if os.path.exists(run_sh):
+            logger.log("Cyberia: Found ACCELA run.sh script")
+            return run_sh
+        elif os.path.exists(accela_bin):
+            logger.log("Cyberia: Found ACCELA binary")
+            return accela_bin
+        elif os.path.exists(accela_appimage):
+            logger.log("Cyberia: Found ACCELA.AppImage")
+            return accela_appimage
+
+    return None
+
+
+def _mtime(path: Optional[str]) -> Optional[float]:
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _site_packages(venv_path: str) -> Optional[str]:
+    matches = glob.glob(os.path.join(venv_path, "lib", "python*", "site-packages"))
+    matches += glob.glob(os.path.join(venv_path, "Lib", "site-packages"))
+    return sorted(matches)[-1] if matches else None
+
+
+def _ensure_dependencies(venv_python: str, accela_dir: str) -> str:
+    """Make sure PyQt6 is importable from ACCELA's venv. Returns what was done.
+
+    "missing" means the install did not leave PyQt6 in place.
+    """
+    # Check if PyQt6 is installed
+    check_cmd = [venv_python, "-m", "pip", "show", "PyQt6"]
+    result = subprocess.run(check_cmd, capture_output=True, text=True)
+    if result.returncode == 0:
+        return "ok"
+
+    logger.warn("Cyberia: PyQt6 not found in ACCELA venv, attempting to install...")
+    install_cmd = [
+        venv_python,
+        "-m",
+        "pip",
+        "install",
+        "-r",
+        f"{accela_dir}/requirements.txt",
+    ]
+    install = subprocess.run(install_cmd, capture_output=True, text=True)
+    if install.returncode != 0:
+        logger.warn(
+            f"Cyberia: Installing ACCELA dependencies failed: {install.stderr.strip()}"
+        )
+        return "missing"
+    if subprocess.run(check_cmd, capture_output=True, text=True).returncode != 0:
+        logger.warn("Cyberia: PyQt6 still missing from ACCELA venv after install")
+        return "missing"
+    return "installed"
+
+
+class AccelaResolver:
+    """Resolve the ACCELA executable once and remember the result.
+
+    The record is keyed on the ``accela_location`` setting, the executable's
+    mtime and the mtime of its venv's site-packages directory, and is kept in
+    memory and in a small JSON file so a restart does not pay for the search
+    and the ``pip show`` check again. Any change to the key triggers a full
+    re-verification; ``resolve(force=True)`` does so unconditionally. A
+    record whose dependencies are still missing is never remembered, so the
+    next call tries the install again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._record: Optional[Dict[str, Any]] = None
+        self._loaded = False
+
+    def resolve(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the current ACCELA record, or None if ACCELA cannot be found."""
+        location = str(get_setting("accela_location", "") or "").strip()
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                data = read_json(self._path)
+                if isinstance(data, dict) and data.get("path"):
+                    self._record = data
+            record = self._record
+            if not force and record is not None and _is_current(record, location):
+                return dict(record)
+
+            record = _verify(location)
+            if record is not None and record.get("dependencies") == "missing":
+                self._record = None
+                return dict(record)
+            self._record = record
+            if record is not None:
+                self._save_locked(record)
+            return dict(record) if record is not None else None
+
+    def _save_locked(self, record: Dict[str, Any]) -> None:
+        try:
+            tmp_path = self._path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(record, handle)
+            os.replace(tmp_path, self._path)
+        except Exception as exc:
+            logger.warn(f"Cyberia: Failed to write ACCELA cache: {exc}")
+
+
+def _is_current(record: Dict[str, Any], location: str) -> bool:
+    if record.get("location") != location:
+        return False
+    if _mtime(record.get("path")) != record.get("mtime"):
+        return False
+    venv_path = os.path.join(os.path.dirname(record["path"]), ".venv")
+    if os.path.isdir(venv_path) != bool(record.get("venv")):
+        return False
+    return _mtime(record.get("sitePackages")) == record.get("siteMtime")
+
+
+def _verify(location: str) -> Optional[Dict[str, Any]]:
+    accela_path = find_accela_executable()
+    if not accela_path:
+        return None
+
+    if not os.access(accela_path, os.X_OK):
+        logger.warn(f"Cyberia: ACCELA found but not executable: {accela_path}")
+        try:
+            os.chmod(accela_path, 0o755)
+            logger.log(f"Cyberia: Made ACCELA executable: {accela_path}")
+        except Exception as e:
+            logger.warn(f"Cyberia: Failed to make ACCELA executable: {e}")
+
+    # Handle ACCELA with its own virtual environment
+    accela_dir = os.path.dirname(accela_path)
+    venv_path = os.path.join(accela_dir, ".venv")
+    has_venv = os.path.isdir(venv_path)
+    dependencies = "skipped"
+    if has_venv and (accela_path.endswith(".sh") or accela_path.endswith(".AppImage")):
+        # Check if dependencies are installed (for AppImage, check in the ACCELA directory)
+        venv_python = os.path.join(venv_path, "bin", "python")
+        if os.path.exists(venv_python):
+            logger.log(f"Cyberia: Using ACCELA virtual environment: {venv_path}")
+            dependencies = _ensure_dependencies(venv_python, accela_dir)
+
+    # Read the key after a possible pip install so it does not invalidate itself.
+    site_packages = _site_packages(venv_path) if has_venv else None
+    qt_lib_path = None
+    if site_packages:
+        candidate = os.path.join(site_packages, "PyQt6", "Qt6", "lib")
+        if os.path.isdir(candidate):
+            qt_lib_path = candidate
+
+    return {
+        "location": location,
+        "path": accela_path,
+        "mtime": _mtime(accela_path),
+        "venv": venv_path if has_venv else None,
+        "sitePackages": site_packages,
+        "siteMtime": _mtime(site_packages),
+        "qtLibPath": qt_lib_path,
+        "dependencies": dependencies,
+        "verifiedAt": time.time(),
+    }
+
+
+# How often a running ACCELA process is checked for cancellation.
+_CANCEL_POLL_SECONDS = 0.2
+
+
+def _signal_process_group(proc: subprocess.Popen, force: bool) -> None:
+    try:
+        if os.name == "nt":
+            # No process groups to signal; the child is stopped on its own.
+            if force:
+                proc.kill()
+            else:
+                proc.terminate()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def _stop_process(proc: subprocess.Popen, grace: float) -> None:
+    """Terminate ACCELA's process group, escalating to a kill after grace seconds."""
+    logger.log(f"Cyberia: Stopping ACCELA (pid={proc.pid})")
+    _signal_process_group(proc, force=False)
+    try:
+        proc.wait(timeout=grace)
+        return
+    except subprocess.TimeoutExpired:
+        pass
+    logger.warn(f"Cyberia: ACCELA ignored SIGTERM for {grace}s, killing it")
+    _signal_process_group(proc, force=True)
+    try:
+        proc.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        logger.warn(f"Cyberia: ACCELA (pid={proc.pid}) is still running after kill")
+
+
+def run_accela_process(
+    command: List[str],
+    env: Dict[str, str],
+    on_line: Callable[[str], None],
+    should_cancel: Callable[[], bool],
+) -> Tuple[Optional[int], List[str], bool]:
+    """Run ACCELA in its own process group and stream its output.
+
+    stdout and stderr are merged and read line by line on a helper thread;
+    each non-empty line goes to on_line and the last ACCELA_OUTPUT_RING_LINES
+    lines are kept. should_cancel is polled while the process runs; once it
+    returns True the process group is terminated and, if it has not exited
+    within ACCELA_CANCEL_GRACE_SECONDS, killed. Returns
+    ``(returncode, output_tail, cancelled)``.
+    """
+    kwargs: Dict[str, Any] = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    proc = subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        **kwargs,
+    )
+
+    ring: deque = deque(maxlen=max(1, int(ACCELA_OUTPUT_RING_LINES)))
+    ring_lock = threading.Lock()
+
+    def pump() -> None:
+        try:
+            for line in proc.stdout:
+                line = line.rstrip("\r\n")
+                with ring_lock:
+                    ring.append(line)
+                if line.strip():
+                    try:
+                        on_line(line)
+                    except Exception:
+                        pass
+        except Exception:
+            pass
+        finally:
+            proc.stdout.close()
+
+    reader = threading.Thread(target=pump, name="cyberia-accela-output", daemon=True)
+    reader.start()
+
+    cancelled = False
+    while True:
+        try:
+            proc.wait(timeout=_CANCEL_POLL_SECONDS)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if should_cancel():
+            cancelled = True
+            _stop_process(proc, ACCELA_CANCEL_GRACE_SECONDS)
+            break
+    # Grandchildren that inherited the pipe can keep it open; don't wait on them.
+    reader.join(timeout=1.0)
+    with ring_lock:
+        output = list(ring)
+    return proc.returncode, output, cancelled
+
+
+_RESOLVER: Optional[AccelaResolver] = None
+_RESOLVER_LOCK = threading.Lock()
+
+
+def get_accela_resolver() -> AccelaResolver:
+    """Return the shared ACCELA resolver, creating it on first use."""
+    global _RESOLVER
+    with _RESOLVER_LOCK:
+        if _RESOLVER is None:
+            _RESOLVER = AccelaResolver(backend_path(ACCELA_CACHE_FILE))
+        return _RESOLVER
+
+
+def refresh_accela() -> str:
+    """Discard the memoized ACCELA record and verify the installation again."""
+    try:
+        record = get_accela_resolver().resolve(force=True)
+        if record is None:
+            return json.dumps({"success": False, "error": "ACCELA not found"})
+        return json.dumps({"success": True, "accela": record})
+    except Exception as exc:
+        logger.warn(f"Cyberia: RefreshAccela failed: {exc}")
+        return json.dumps({"success": False, "error": str(exc)})
+
+
+__all__ = [
+    "AccelaResolver",
+    "find_accela_executable",
+    "get_accela_resolver",
+    "refresh_accela",
+    "run_accela_process",
+]
@@ -0,0 +1,197 @@
+"""Observed per-API performance used to order download candidates."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import (
+    API_STATS_ALPHA,
+    API_STATS_DEFAULT_THROUGHPUT_BPS,
+    API_STATS_FILE,
+    API_STATS_SAVE_INTERVAL_SECONDS,
+    API_STATS_TYPICAL_BYTES,
+)
+from logger import logger
+from paths import backend_path
+from utils import read_json
+
+# Floor for the success ratio so one bad streak cannot push an API's expected
+# cost to infinity; it can still recover once it starts serving again.
+_MIN_SUCCESS_RATIO = 0.05
+
+
+def classify_error(exc: BaseException) -> str:
+    """Map a transport exception to a coarse error class."""
+    error_class = getattr(exc, "error_class", None)
+    if isinstance(error_class, str):
+        return error_class
+    name = type(exc).__name__
+    if "Timeout" in name:
+        return "timeout"
+    if "Connect" in name:
+        return "connect"
+    if "Protocol" in name or "Read" in name:
+        return "transport"
+    return name
+
+
+def _ewma(previous: Optional[float], sample: float) -> float:
+    if previous is None:
+        return sample
+    return API_STATS_ALPHA * sample + (1 - API_STATS_ALPHA) * previous
+
+
+def _new_entry() -> Dict[str, Any]:
+    return {
+        "ttfbMs": None,
+        "throughputBps": None,
+        "successRatio": 1.0,
+        "probes": 0,
+        "served": 0,
+        "notFound": 0,
+        "errors": {},
+        "lastError": None,
+        "lastUsed": None,
+    }
+
+
+class ApiStatsTracker:
+    """EWMA statistics per API name, persisted to a small JSON file.
+
+    Candidates are ranked by expected time to fetch a typical manifest:
+    ``(ttfb + typical_bytes / throughput) / success_ratio``. APIs without
+    samples rank first so they get measured, and pinned APIs always stay
+    ahead of the adaptive order in their settings order.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._last_save = 0.0
+        self._dirty = False
+        data = read_json(path)
+        entries = data.get("apis") if isinstance(data, dict) else None
+        if isinstance(entries, dict):
+            for name, entry in entries.items():
+                if isinstance(entry, dict):
+                    merged = _new_entry()
+                    merged.update(entry)
+                    self._entries[name] = merged
+
+    def record_probe(
+        self,
+        name: str,
+        ttfb: Optional[float],
+        outcome: str,
+        error_class: Optional[str] = None,
+    ) -> None:
+        """Record one probe: outcome is "ok", "not_found" or "error"."""
+        with self._lock:
+            entry = self._entries.setdefault(name, _new_entry())
+            entry["probes"] += 1
+            entry["lastUsed"] = time.time()
+            if ttfb is not None:
+                entry["ttfbMs"] = round(_ewma(entry["ttfbMs"], ttfb * 1000.0), 1)
+            if outcome == "ok":
+                entry["served"] += 1
+            elif outcome == "not_found":
+                entry["notFound"] += 1
+            else:
+                error_class = error_class or "other"
+                entry["errors"][error_class] = entry["errors"].get(error_class, 0) + 1
+                entry["lastError"] = error_class
+            sample = 1.0 if outcome == "ok" else 0.0
+            entry["successRatio"] = round(_ewma(entry["successRatio"], sample), 4)
+            self._mark_dirty_locked()
+
+    def record_transfer(self, name: str, nbytes: int, seconds: float) -> None:
+        if nbytes <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            entry = self._entries.setdefault(name, _new_entry())
+            entry["throughputBps"] = round(
+                _ewma(entry["throughputBps"], nbytes / seconds), 1
+            )
+            self._mark_dirty_locked()
+
+    def record_failure(self, name: str, error_class: str) -> None:
+        """Record an error after the probe succeeded, e.g. a broken stream."""
+        with self._lock:
+            entry = self._entries.setdefault(name, _new_entry())
+            entry["errors"][error_class] = entry["errors"].get(error_class, 0) + 1
+            entry["lastError"] = error_class
+            entry["successRatio"] = round(_ewma(entry["successRatio"], 0.0), 4)
+            self._mark_dirty_locked()
+
+    def expected_cost(self, name: str) -> Optional[float]:
+        """Expected seconds to fetch a typical manifest, or None if unmeasured."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry["ttfbMs"] is None:
+                return None
+            throughput = entry["throughputBps"] or API_STATS_DEFAULT_THROUGHPUT_BPS
+            cost = entry["ttfbMs"] / 1000.0 + API_STATS_TYPICAL_BYTES / throughput
+            return cost / max(entry["successRatio"], _MIN_SUCCESS_RATIO)
+
+    def rank(self, candidates: List[dict]) -> List[dict]:
+        """Return candidates ordered pinned first, then unmeasured, then by cost."""
+
+        def sort_key(indexed):
+            index, candidate = indexed
+            if candidate.get("pinned"):
+                return (0, 0.0, index)
+            cost = self.expected_cost(candidate["name"])
+            if cost is None:
+                return (1, 0.0, index)
+            return (2, cost, index)
+
+        return [c for _, c in sorted(enumerate(candidates), key=sort_key)]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {**entry, "errors": dict(entry["errors"])}
+                for name, entry in self._entries.items()
+            }
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._save_locked()
+
+    def _mark_dirty_locked(self) -> None:
+        self._dirty = True
+        if time.monotonic() - self._last_save >= API_STATS_SAVE_INTERVAL_SECONDS:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        self._last_save = time.monotonic()
+        self._dirty = False
+        try:
+            tmp_path = self._path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump({"apis": self._entries}, handle)
+            os.replace(tmp_path, self._path)
+        except Exception as exc:
+            logger.warn(f"Cyberia: Failed to write API stats: {exc}")
+
+
+_TRACKER: Optional[ApiStatsTracker] = None
+_TRACKER_LOCK = threading.Lock()
+
+
+def get_stats_tracker() -> ApiStatsTracker:
+    """Return the shared API statistics tracker, creating it on first use."""
+    global _TRACKER
+    with _TRACKER_LOCK:
+        if _TRACKER is None:
+            _TRACKER = ApiStatsTracker(backend_path(API_STATS_FILE))
+        return _TRACKER
+
+
+__all__ = ["ApiStatsTracker", "classify_error", "get_stats_tracker"]
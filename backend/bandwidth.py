@@ -0,0 +1,159 @@
+"""Token-bucket bandwidth limits for manifest downloads."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import DOWNLOAD_BURST_BYTES, DOWNLOAD_RATE_LIMIT_BPS
+from settings import get_setting
+
+# Longest single sleep while waiting for tokens, so rate changes and
+# cancellation take effect promptly.
+_MAX_WAIT_SLICE = 0.25
+
+
+class TokenBucket:
+    """Byte budget refilled at ``rate`` bytes per second, holding up to ``burst``.
+
+    ``consume()`` takes the bytes straight away and, if that leaves the
+    bucket in debt, blocks until the refill has paid it back. A full bucket
+    lets ``burst`` bytes through at line rate, so a small manifest finishes
+    without ever waiting. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._lock = threading.Lock()
+        self._rate = max(0.0, float(rate))
+        self._burst = max(0, int(burst))
+        self._tokens = float(self._burst)
+        self._stamp = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def burst(self) -> int:
+        return self._burst
+
+    def configure(self, rate: float, burst: Optional[int] = None) -> None:
+        with self._lock:
+            self._refill_locked()
+            self._rate = max(0.0, float(rate))
+            if burst is not None:
+                self._burst = max(0, int(burst))
+                self._tokens = min(self._tokens, float(self._burst))
+
+    def consume(self, nbytes: int, cancel_event: Optional[threading.Event] = None):
+        """Charge nbytes, waiting while in debt. Returns False if cancelled."""
+        with self._lock:
+            if self._rate <= 0:
+                return True
+            self._refill_locked()
+            self._tokens -= nbytes
+        while True:
+            with self._lock:
+                if self._rate <= 0:
+                    return True
+                self._refill_locked()
+                if self._tokens >= 0:
+                    return True
+                delay = min(_MAX_WAIT_SLICE, -self._tokens / self._rate)
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                return False
+
+    def _refill_locked(self) -> None:
+        now = time.monotonic()
+        if self._rate > 0:
+            self._tokens = min(
+                float(self._burst), self._tokens + (now - self._stamp) * self._rate
+            )
+        else:
+            self._tokens = float(self._burst)
+        self._stamp = now
+
+
+class BandwidthLimiter:
+    """The global download bucket plus per-appid overrides.
+
+    Jobs without an override share the global bucket, so its rate caps all
+    background downloads together. An override gives one appid a bucket of
+    its own instead; an override of 0 lets that job run unthrottled.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._lock = threading.Lock()
+        self._global = TokenBucket(rate, burst)
+        self._overrides: Dict[int, TokenBucket] = {}
+
+    @property
+    def global_bucket(self) -> TokenBucket:
+        return self._global
+
+    def set_override(
+        self, appid: int, rate: Optional[float], burst: Optional[int] = None
+    ) -> None:
+        """Give appid its own rate, or drop its override when rate is None."""
+        with self._lock:
+            if rate is None:
+                self._overrides.pop(appid, None)
+                return
+            bucket = self._overrides.get(appid)
+            if bucket is None:
+                burst = self._global.burst if burst is None else burst
+                self._overrides[appid] = TokenBucket(rate, burst)
+            else:
+                bucket.configure(rate, burst)
+
+    def bucket_for(self, appid: int) -> Optional[TokenBucket]:
+        """Return the bucket appid draws from, or None when it is unlimited."""
+        with self._lock:
+            bucket = self._overrides.get(appid, self._global)
+        return bucket if bucket.rate > 0 else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            overrides = {
+                str(appid): {"rateBps": int(b.rate), "burstBytes": b.burst}
+                for appid, b in self._overrides.items()
+            }
+        return {
+            "rateBps": int(self._global.rate),
+            "burstBytes": self._global.burst,
+            "overrides": overrides,
+        }
+
+
+def read_limit_settings():
+    """Return (rate, burst) from settings, falling back to the config defaults."""
+    try:
+        rate = float(get_setting("download_rate_limit_bps", DOWNLOAD_RATE_LIMIT_BPS))
+        burst = int(get_setting("download_burst_bytes", DOWNLOAD_BURST_BYTES))
+    except Exception:
+        return DOWNLOAD_RATE_LIMIT_BPS, DOWNLOAD_BURST_BYTES
+    return max(0.0, rate), max(0, burst)
+
+
+_LIMITER: Optional[BandwidthLimiter] = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def get_bandwidth_limiter() -> BandwidthLimiter:
+    """Return the shared bandwidth limiter, creating it on first use."""
+    global _LIMITER
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            _LIMITER = BandwidthLimiter(*read_limit_settings())
+        return _LIMITER
+
+
+__all__ = [
+    "BandwidthLimiter",
+    "TokenBucket",
+    "get_bandwidth_limiter",
+    "read_limit_settings",
+]
@@ -0,0 +1,138 @@
+"""Per-API circuit breakers that stop probing hosts which keep timing out."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import (
+    CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+)
+from logger import logger
+from settings import get_setting
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Only failures that say nothing about the title itself trip a breaker; any
+# HTTP answer (even a 404 or a 500) proves the host is reachable.
+TRIPPING_ERRORS = frozenset({"connect", "timeout"})
+
+
+class CircuitBreakers:
+    """Closed/open/half-open state machine per API name.
+
+    After ``threshold`` consecutive connect or timeout failures an API opens
+    and ``allow()`` refuses it for ``cooldown`` seconds. The first ``allow()``
+    after the cooldown moves it to half-open and lets exactly one probe
+    through; that probe's outcome closes the breaker or re-opens it. A probe
+    that ends without an outcome must call ``release_probe()``, which
+    re-opens the breaker for another cooldown so a later probe is allowed.
+    """
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self._threshold = max(1, int(threshold))
+        self._cooldown = max(0.0, float(cooldown))
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, Dict[str, Any]] = {}
+
+    def _get_locked(self, name: str) -> Dict[str, Any]:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = {"state": CLOSED, "failures": 0, "openedAt": 0.0}
+            self._breakers[name] = breaker
+        return breaker
+
+    def allow(self, name: str) -> bool:
+        """Return True if a request to name may be sent now."""
+        with self._lock:
+            breaker = self._get_locked(name)
+            if breaker["state"] == CLOSED:
+                return True
+            if breaker["state"] == HALF_OPEN:
+                return False
+            if time.monotonic() - breaker["openedAt"] < self._cooldown:
+                return False
+            breaker["state"] = HALF_OPEN
+            logger.log(f"Cyberia: Circuit for API '{name}' half-open, sending probe")
+            return True
+
+    def record_success(self, name: str) -> None:
+        with self._lock:
+            breaker = self._get_locked(name)
+            if breaker["state"] != CLOSED:
+                logger.log(f"Cyberia: Circuit for API '{name}' closed")
+            breaker.update({"state": CLOSED, "failures": 0})
+
+    def release_probe(self, name: str) -> None:
+        """Give back a half-open probe that was abandoned before it answered."""
+        with self._lock:
+            breaker = self._get_locked(name)
+            if breaker["state"] == HALF_OPEN:
+                breaker["state"] = OPEN
+                breaker["openedAt"] = time.monotonic()
+
+    def record_failure(self, name: str, error_class: Optional[str]) -> None:
+        if error_class not in TRIPPING_ERRORS:
+            self.record_success(name)
+            return
+        with self._lock:
+            breaker = self._get_locked(name)
+            breaker["failures"] += 1
+            if breaker["state"] == HALF_OPEN or breaker["failures"] >= self._threshold:
+                if breaker["state"] != OPEN:
+                    logger.warn(
+                        f"Cyberia: Circuit for API '{name}' opened after {breaker['failures']} failure(s)"
+                    )
+                breaker["state"] = OPEN
+                breaker["openedAt"] = time.monotonic()
+
+    def state(self, name: str) -> Dict[str, Any]:
+        """Return a JSON-ready view of one breaker."""
+        with self._lock:
+            breaker = self._get_locked(name)
+            view = {"state": breaker["state"], "failures": breaker["failures"]}
+            if breaker["state"] == OPEN:
+                remaining = self._cooldown - (time.monotonic() - breaker["openedAt"])
+                view["retryInMs"] = max(0, int(remaining * 1000))
+            return view
+
+
+_BREAKERS: Optional[CircuitBreakers] = None
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_circuit_breakers() -> CircuitBreakers:
+    """Return the shared breaker registry, creating it on first use."""
+    global _BREAKERS
+    with _BREAKERS_LOCK:
+        if _BREAKERS is None:
+            try:
+                threshold = int(
+                    get_setting(
+                        "circuit_breaker_threshold", CIRCUIT_BREAKER_FAILURE_THRESHOLD
+                    )
+                )
+                cooldown = float(
+                    get_setting(
+                        "circuit_breaker_cooldown_seconds",
+                        CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+                    )
+                )
+            except Exception:
+                threshold = CIRCUIT_BREAKER_FAILURE_THRESHOLD
+                cooldown = CIRCUIT_BREAKER_COOLDOWN_SECONDS
+            _BREAKERS = CircuitBreakers(threshold, cooldown)
+        return _BREAKERS
+
+
+__all__ = [
+    "CLOSED",
+    "HALF_OPEN",
+    "OPEN",
+    "CircuitBreakers",
+    "get_circuit_breakers",
+]
@@ -3,8 +3,141 @@ WEB_UI_JS_FILE = "cyberia.js"
 
 SETTINGS_JSON_FILE = "settings.json"
 
-HTTP_TIMEOUT_SECONDS = 15
+HTTP_TIMEOUT_SECONDS = 15  # read timeout
 HTTP_PROXY_TIMEOUT_SECONDS = 15
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+HTTP_WRITE_TIMEOUT_SECONDS = 10
+HTTP_POOL_TIMEOUT_SECONDS = 10
+
+# Shared client pool. HTTP/2 is only used when the h2 package is installed.
+HTTP_MAX_CONNECTIONS = 16
+HTTP_MAX_CONNECTIONS_PER_HOST = 4
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 8
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30
+HTTP2_ENABLED = True
+
+# Warm-up of API hosts at plugin load: DNS plus one HEAD per host, one host
+# at a time, and at most one round per PREWARM_MIN_INTERVAL_SECONDS.
+PREWARM_ENABLED = True
+PREWARM_MAX_HOSTS = 8
+PREWARM_HOST_INTERVAL_SECONDS = 0.25
+PREWARM_MIN_INTERVAL_SECONDS = 60
+
+# In-process DNS cache: answers are reused for DNS_CACHE_TTL_SECONDS, then
+# served stale for up to DNS_CACHE_STALE_SECONDS more while refreshed in the
+# background. Connection attempts to a host's addresses start
+# HAPPY_EYEBALLS_DELAY_SECONDS apart.
+DNS_CACHE_ENABLED = True
+DNS_CACHE_TTL_SECONDS = 5 * 60
+DNS_CACHE_STALE_SECONDS = 60 * 60
+HAPPY_EYEBALLS_DELAY_SECONDS = 0.25
+
+# How long close_http_client lets open requests finish before closing.
+HTTP_DRAIN_TIMEOUT_SECONDS = 5
+
+# Default retry policy for API requests; api_list entries can override it
+# with a "retry" object (see http_client.RetryPolicy).
+HTTP_RETRY_ATTEMPTS = 3
+HTTP_RETRY_BASE_MS = 250
+HTTP_RETRY_CAP_MS = 4000
+HTTP_RETRY_AFTER_MAX_SECONDS = 10
+HTTP_RETRY_STATUSES = (429, 502, 503, 504)
+
+DOWNLOAD_MAX_WORKERS = 2
+# How long unload waits for running downloads to wind down before closing
+# the job store.
+DOWNLOAD_SHUTDOWN_WAIT_SECONDS = 5
+
+# How often a streaming download wakes long-polling status callers, and the
+# default/maximum time wait_add_status blocks before answering unchanged.
+JOB_PROGRESS_PUBLISH_SECONDS = 0.25
+STATUS_WAIT_DEFAULT_SECONDS = 10
+STATUS_WAIT_MAX_SECONDS = 25
+# Millennium runs backend calls inline, so a long wait would hold up every
+# other call (a cancel included) behind it; waits there stay this short.
+MILLENNIUM_STATUS_WAIT_MAX_SECONDS = 1
+
+# Time constant of the speed estimate behind a job's speedBps and etaSeconds.
+JOB_SPEED_WINDOW_SECONDS = 2.0
+
+# Evicted jobs remembered for get_all_statuses deltas; older clients resync.
+JOB_TOMBSTONES_MAX = 256
+
+# Finished jobs stay queryable for the TTL; the table never holds more than
+# JOB_TABLE_MAX jobs unless that many are still running.
+JOB_FINISHED_TTL_SECONDS = 15 * 60
+JOB_TABLE_MAX = 200
+JOB_PRUNE_INTERVAL_SECONDS = 30
+
+HISTORY_FILE = "history.jsonl"
+HISTORY_MAX_ENTRIES = 500
+HISTORY_DEFAULT_LIMIT = 50
+
+# SQLite record of job states used to requeue interrupted work on load; job
+# changes are written in one transaction at most this often.
+JOB_STORE_FILE = "jobs.sqlite3"
+JOB_STORE_FLUSH_SECONDS = 0.5
+
+# Batches started with start_add_batch that stay queryable, oldest dropped first.
+BATCH_HISTORY_MAX = 32
+
+# Zips finishing within the window share one ACCELA run, up to ACCELA_BATCH_MAX
+# per run. 1 keeps one ACCELA process per zip, for ACCELA builds that only
+# accept a single zip on the command line.
+ACCELA_BATCH_MAX = 1
+ACCELA_BATCH_WINDOW_MS = 750
+
+# Resolved ACCELA path and dependency check, reused until the install changes.
+ACCELA_CACHE_FILE = "accela_cache.json"
+
+# Lines of ACCELA output kept per run, and how long a cancelled run gets to
+# exit after SIGTERM before it is killed.
+ACCELA_OUTPUT_RING_LINES = 100
+ACCELA_CANCEL_GRACE_SECONDS = 3
+
+# "off" probes APIs one at a time, "all" races every enabled API at once and
+# "staggered" starts the next probe after API_RACE_STAGGER_MS without an answer.
+API_RACE_MODE = "staggered"
+API_RACE_STAGGER_MS = 500
+
+# How often the .part journal is refreshed while a download is streaming.
+DOWNLOAD_JOURNAL_FLUSH_BYTES = 1024 * 1024
+
+# A stream that delivers nothing for this long is flagged as stalled (0 turns
+# detection off); with failover the connection is dropped and the next API
+# tried instead of waiting for HTTP_TIMEOUT_SECONDS.
+DOWNLOAD_STALL_SECONDS = 5
+DOWNLOAD_STALL_FAILOVER = True
+
+# Global cap on download bandwidth in bytes per second (0 = unlimited). A full
+# bucket lets DOWNLOAD_BURST_BYTES through at line rate, so typical manifests
+# are not slowed down at all.
+DOWNLOAD_RATE_LIMIT_BPS = 0
+DOWNLOAD_BURST_BYTES = 4 * 1024 * 1024
+
+# Check zip structure and member CRCs while the body streams to disk.
+ZIP_STREAM_VALIDATION = True
+
+# Bodies up to this size are kept in memory and only written out (to tmpfs when
+# available) right before ACCELA runs; 0 streams every body to temp_dl.
+DOWNLOAD_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+MANIFEST_CACHE_DIR_NAME = "manifest_cache"
+MANIFEST_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+NEGATIVE_CACHE_FILE = "negative_cache.json"
+NEGATIVE_CACHE_TTL_SECONDS = 6 * 60 * 60  # 6 hours
+NEGATIVE_CACHE_MAX_ENTRIES = 5000
+
+API_STATS_FILE = "api_stats.json"
+API_STATS_ALPHA = 0.3  # EWMA weight of the newest sample
+API_STATS_TYPICAL_BYTES = 512 * 1024  # manifest size used to weigh throughput
+API_STATS_DEFAULT_THROUGHPUT_BPS = 1024 * 1024  # assumed until measured
+API_STATS_SAVE_INTERVAL_SECONDS = 30
+
+# Consecutive connect/timeout failures before an API is skipped for a cooldown.
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 3
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = 60
 
 UPDATE_CHECK_INTERVAL_SECONDS = 2 * 60 * 60  # 2 hours
 
@@ -2,122 +2,123 @@
 
 from __future__ import annotations
 
+import itertools
 import json
 import os
-import platform
-import shutil
-import subprocess
+import queue
+import re
 import threading
 import time
-from typing import Dict
+import uuid
+from typing import Dict, List, Optional, Tuple, Union
 
+from accela import get_accela_resolver, run_accela_process
 from api_manifest import load_api_manifest
-from config import USER_AGENT
-from http_client import ensure_http_client
+from api_stats import classify_error, get_stats_tracker
+from bandwidth import get_bandwidth_limiter, read_limit_settings
+from circuit_breaker import get_circuit_breakers
+from config import (
+    ACCELA_BATCH_MAX,
+    ACCELA_BATCH_WINDOW_MS,
+    API_RACE_MODE,
+    API_RACE_STAGGER_MS,
+    BATCH_HISTORY_MAX,
+    DOWNLOAD_JOURNAL_FLUSH_BYTES,
+    DOWNLOAD_MAX_WORKERS,
+    DOWNLOAD_SPOOL_MAX_BYTES,
+    DOWNLOAD_STALL_FAILOVER,
+    DOWNLOAD_STALL_SECONDS,
+    HISTORY_DEFAULT_LIMIT,
+    JOB_PROGRESS_PUBLISH_SECONDS,
+    JOB_SPEED_WINDOW_SECONDS,
+    STATUS_WAIT_DEFAULT_SECONDS,
+    STATUS_WAIT_MAX_SECONDS,
+    USER_AGENT,
+    ZIP_STREAM_VALIDATION,
+)
+from history import get_job_history
+from http_client import (
+    RetryPolicy,
+    SlotWaitAborted,
+    ensure_http_client,
+    get_dns_cache,
+    send_with_retry,
+)
+from install_batch import InstallBatcher
+from job_store import get_job_store
+from jobs import (
+    JOBS,
+    JOBS_LOCK,
+    SHORT_KEYS,
+    DownloadJob,
+    changes_since,
+    create_job,
+    get_job,
+    wait_for_job,
+)
 from logger import logger
-from utils import ensure_temp_download_dir, get_accela_api_key
+from negative_cache import api_fingerprint, get_negative_cache
+from prewarm import is_warm, prewarm_snapshot
+from resume import (
+    JOURNAL_SUFFIX,
+    PART_SUFFIX,
+    clear_partial,
+    load_resume_point,
+    part_path,
+    save_journal,
+)
+from scheduler import PRIORITY_NORMAL, DownloadScheduler, normalize_priority
+from settings import get_setting, load_settings, save_settings
+from transfer_monitor import (
+    DownloadStalled,
+    RequestAborter,
+    StallWatchdog,
+    TransferMeter,
+    abort_stream,
+)
+from utils import ensure_spool_dir, ensure_temp_download_dir, get_accela_api_key
+from zip_cache import get_manifest_cache
+from zip_stream import StreamingZipValidator, ZipValidationError
 
-DOWNLOAD_STATE: Dict[int, Dict[str, any]] = {}
-DOWNLOAD_LOCK = threading.Lock()
+ZIP_MAGICS = (b"PK\x03\x04", b"PK\x05\x06", b"PK\x07\x08")
 
+_SCHEDULER: Optional[DownloadScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
 
-def _find_accela_executable():
-    """Find ACCELA executable using configuration or search strategies."""
-    # First, try to read accela_location from settings.json
-    settings_path = os.path.join(os.path.dirname(__file__), "settings.json")
-    if os.path.exists(settings_path):
-        try:
-            with open(settings_path, "r", encoding="utf-8") as f:
-                settings = json.load(f)
-                accela_path = settings.get("accela_location")
-                if accela_path:
-                    accela_path = accela_path.strip()
-                    if accela_path and os.path.exists(accela_path):
-                        logger.log(
-                            f"Cyberia: Using ACCELA from settings.json: {accela_path}"
-                        )
-                        return accela_path
-                    elif accela_path:
-                        logger.warn(
-                            f"Cyberia: ACCELA path in settings.json not found: {accela_path}"
-                        )
-        except Exception as e:
-            logger.warn(f"Failed to load settings.json: {e}")
-
-    # Fallback to platform-specific search
-    system = platform.system()
-
-    if system == "Windows":
-        # Try PATH first
-        accela_path = shutil.which("ACCELA.exe") or shutil.which("ACCELA")
-        if accela_path:
-            logger.log(f"Cyberia: Found ACCELA in PATH: {accela_path}")
-            return accela_path
-
-        # Try common Windows locations
-        common_paths = [
-            os.path.expandvars(r"%APPDATA%\ACCELA\ACCELA.exe"),
-            os.path.expandvars(r"%LOCALAPPDATA%\ACCELA\ACCELA.exe"),
-            os.path.expandvars(r"%PROGRAMFILES%\ACCELA\ACCELA.exe"),
-            os.path.expandvars(r"%PROGRAMFILES(X86)%\ACCELA\ACCELA.exe"),
-            os.path.expanduser(r"~\Desktop\ACCELA.exe"),
-            os.path.expanduser(r"~\Documents\ACCELA.exe"),
-        ]
-
-        for path in common_paths:
-            if os.path.exists(path):
-                logger.log(f"Cyberia: Found ACCELA at common location: {path}")
-                return path
-    else:
-        # Linux/Mac behavior
-        # Check system-wide location first
-        system_run_sh = "/usr/share/ACCELA/systemrun.sh"
-        if os.path.exists(system_run_sh):
-            logger.log("Cyberia: Found ACCELA systemrun.sh script")
-            return system_run_sh
-
-        # Check user-specific locations
-        accela_home = os.path.expanduser("~/.local/share/ACCELA")
-        run_sh = os.path.join(accela_home, "run.sh")
-        accela_bin = os.path.join(accela_home, "ACCELA")
-        accela_appimage = os.path.join(accela_home, "ACCELA.AppImage")
-
-        if os.path.exists(run_sh):
-            logger.log("Cyberia: Found ACCELA run.sh script")
-            return run_sh
-        elif os.path.exists(accela_bin):
-            logger.log("Cyberia: Found ACCELA binary")
-            return accela_bin
-        elif os.path.exists(accela_appimage):
-            logger.log("Cyberia: Found ACCELA.AppImage")
-            return accela_appimage
-
-    return None
-
-
-def _set_download_state(appid: int, update: dict) -> None:
-    with DOWNLOAD_LOCK:
-        state = DOWNLOAD_STATE.get(appid) or {}
-        state.update(update)
-        DOWNLOAD_STATE[appid] = state
 
+def _get_scheduler() -> DownloadScheduler:
+    """Create the shared download scheduler on first use."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            try:
+                workers = int(
+                    get_setting("max_concurrent_downloads", DOWNLOAD_MAX_WORKERS)
+                )
+            except Exception:
+                workers = DOWNLOAD_MAX_WORKERS
+            _SCHEDULER = DownloadScheduler(_run_download_job, max_workers=workers)
+            logger.log(
+                f"Cyberia: Download scheduler started with {_SCHEDULER.max_workers} worker(s)"
+            )
+        return _SCHEDULER
 
-def _get_download_state(appid: int) -> dict:
-    with DOWNLOAD_LOCK:
-        return DOWNLOAD_STATE.get(appid, {}).copy()
 
+def _process_and_install_lua(jobs: List[DownloadJob], zip_paths: List[str]) -> None:
+    """Process downloaded zips and call ACCELA app to handle installation.
 
-def _process_and_install_lua(appid: int, zip_path: str) -> None:
-    """Process downloaded zip and call ACCELA app to handle installation."""
+    All zips are passed to one ACCELA invocation; jobs[i] owns zip_paths[i].
+    """
 
-    if _is_download_cancelled(appid):
+    if all(job.cancelled for job in jobs):
         raise RuntimeError("cancelled")
 
-    _set_download_state(appid, {"status": "installing"})
+    for job in jobs:
+        job.update({"status": "installing", "installBatch": len(jobs)})
 
-    accela_path = _find_accela_executable()
+    record = get_accela_resolver().resolve()
 
-    if not accela_path:
+    if not record:
         # Provide helpful error message
         settings_path = os.path.join(os.path.dirname(__file__), "settings.json")
         raise RuntimeError(
@@ -126,66 +127,18 @@ def _process_and_install_lua(appid: int, zip_path: str) -> None:
             f'Add: {{"accela_location": "C:\\\\path\\\\to\\\\ACCELA.exe"}}'
         )
 
-    if not os.access(accela_path, os.X_OK):
-        logger.warn(f"Cyberia: ACCELA found but not executable: {accela_path}")
-        try:
-            os.chmod(accela_path, 0o755)
-            logger.log(f"Cyberia: Made ACCELA executable: {accela_path}")
-        except Exception as e:
-            logger.warn(f"Cyberia: Failed to make ACCELA executable: {e}")
-
-    # Handle ACCELA with its own virtual environment
-    accela_dir = os.path.dirname(accela_path)
-    venv_path = os.path.join(accela_dir, ".venv")
-
-    if os.path.exists(venv_path) and (accela_path.endswith(".sh") or accela_path.endswith(".AppImage")):
-        # Check if dependencies are installed (for AppImage, check in the ACCELA directory)
-        venv_python = os.path.join(venv_path, "bin", "python")
-        if os.path.exists(venv_python):
-            logger.log(f"Cyberia: Using ACCELA virtual environment: {venv_path}")
-
-            # Check if PyQt6 is installed
-            check_cmd = [venv_python, "-m", "pip", "show", "PyQt6"]
-            result = subprocess.run(check_cmd, capture_output=True, text=True)
-
-            if result.returncode != 0:
-                logger.warn(
-                    "Cyberia: PyQt6 not found in ACCELA venv, attempting to install..."
-                )
-                install_cmd = [
-                    venv_python,
-                    "-m",
-                    "pip",
-                    "install",
-                    "-r",
-                    f"{accela_dir}/requirements.txt",
-                ]
-                subprocess.run(install_cmd, capture_output=True)
-
-            # Run ACCELA's run.sh script which handles venv activation
-            # For AppImage, run directly (no bash prefix)
-            if accela_path.endswith(".AppImage"):
-                command = [accela_path, zip_path]
-            else:
-                command = ["bash", accela_path, zip_path]
-        else:
-            # Regular execution
-            command = [accela_path, zip_path]
-            if accela_path.endswith(".sh"):
-                command.insert(0, "bash")
-            # AppImage doesn't need bash prefix
-    else:
-        # Regular execution
-        command = [accela_path, zip_path]
-        if accela_path.endswith(".sh"):
-            command.insert(0, "bash")
-        # AppImage doesn't need bash prefix
+    # Run ACCELA's run.sh script which handles venv activation
+    # AppImage and binaries don't need bash prefix
+    accela_path = record["path"]
+    command = [accela_path, *zip_paths]
+    if accela_path.endswith(".sh"):
+        command.insert(0, "bash")
 
     try:
-        if _is_download_cancelled(appid):
+        if all(job.cancelled for job in jobs):
             raise RuntimeError("cancelled")
 
-        logger.log(f"Cyberia: Calling ACCELA with zip: {zip_path}")
+        logger.log(f"Cyberia: Calling ACCELA with zip: {', '.join(zip_paths)}")
 
         # Create a clean environment to avoid Qt library conflicts
         env = os.environ.copy()
@@ -201,234 +154,942 @@ def _process_and_install_lua(appid: int, zip_path: str) -> None:
         env.pop("QT_INSTALL_PLUGINS", None)
 
         # Set LD_LIBRARY_PATH to use bundled Qt6 libraries from ACCELA venv
-        if os.path.exists(venv_path):
-            qt6_lib_path = os.path.join(
-                venv_path, "lib", "python3.13", "site-packages", "PyQt6", "Qt6", "lib"
-            )
-            if os.path.exists(qt6_lib_path):
-                current_ld_path = env.get("LD_LIBRARY_PATH", "")
-                if current_ld_path:
-                    env["LD_LIBRARY_PATH"] = f"{qt6_lib_path}:{current_ld_path}"
-                else:
-                    env["LD_LIBRARY_PATH"] = qt6_lib_path
-                logger.log(f"Cyberia: Set LD_LIBRARY_PATH to: {qt6_lib_path}")
+        qt6_lib_path = record.get("qtLibPath")
+        if qt6_lib_path and os.path.exists(qt6_lib_path):
+            current_ld_path = env.get("LD_LIBRARY_PATH", "")
+            if current_ld_path:
+                env["LD_LIBRARY_PATH"] = f"{qt6_lib_path}:{current_ld_path}"
+            else:
+                env["LD_LIBRARY_PATH"] = qt6_lib_path
+            logger.log(f"Cyberia: Set LD_LIBRARY_PATH to: {qt6_lib_path}")
+
+        def report_progress(line: str) -> None:
+            for job in jobs:
+                job.update({"installProgress": line})
 
-        result = subprocess.run(command, capture_output=True, text=True, env=env)
+        returncode, output, cancelled = run_accela_process(
+            command,
+            env,
+            report_progress,
+            lambda: all(job.cancelled for job in jobs),
+        )
+        if cancelled:
+            logger.log("Cyberia: ACCELA stopped after cancellation")
+            raise RuntimeError("cancelled")
 
-        if result.returncode != 0:
-            logger.warn(f"Cyberia: ACCELA failed with return code {result.returncode}")
-            if result.stderr:
-                logger.warn(f"Cyberia: ACCELA stderr: {result.stderr}")
-            raise RuntimeError(f"ACCELA execution failed with code {result.returncode}")
+        if returncode != 0:
+            logger.warn(f"Cyberia: ACCELA failed with return code {returncode}")
+            if output:
+                logger.warn("Cyberia: ACCELA output: " + "\n".join(output))
+            for job in jobs:
+                job.update({"installLog": output})
+            raise RuntimeError(f"ACCELA execution failed with code {returncode}")
 
         logger.log("Cyberia: ACCELA completed successfully")
-        if result.stdout:
-            logger.log(f"Cyberia: ACCELA output: {result.stdout}")
+        if output:
+            logger.log("Cyberia: ACCELA output: " + "\n".join(output))
 
-        _set_download_state(appid, {"installedPath": zip_path})
+        for job, zip_path in zip(jobs, zip_paths):
+            job.update({"installedPath": zip_path})
     except Exception as exc:
-        logger.warn("Cyberia: Failed to execute ACCELA: {exc}")
+        if isinstance(exc, RuntimeError) and str(exc) == "cancelled":
+            raise
+        logger.warn(f"Cyberia: Failed to execute ACCELA: {exc}")
         raise RuntimeError(f"ACCELA execution failed: {exc}")
 
+    for zip_path in zip_paths:
+        try:
+            os.remove(zip_path)
+        except Exception:
+            try:
+                for _ in range(3):
+                    time.sleep(0.2)
+                    try:
+                        os.remove(zip_path)
+                        break
+                    except Exception:
+                        continue
+            except Exception:
+                pass
+
+
+def _finish_install(
+    job: DownloadJob,
+    zip_path: str,
+    api_name: Optional[str],
+    error: Optional[BaseException],
+) -> None:
+    """Record the outcome of an ACCELA run on the job and clean up its zip."""
+    appid = job.appid
+    if error is None and job.cancelled:
+        logger.log(
+            f"Cyberia: Installation complete but marked cancelled for appid={appid}"
+        )
+        error = RuntimeError("cancelled")
+    if error is None:
+        job.update({"status": "done", "success": True, "api": api_name})
+        return
+    if isinstance(error, RuntimeError) and str(error) == "cancelled":
+        try:
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+        except Exception:
+            pass
+        logger.log(f"Cyberia: Cancelled download cleanup complete for appid={appid}")
+        return
+    logger.warn(f"Cyberia: Processing failed -> {error}")
+    job.update(
+        {
+            "status": "failed",
+            "error": f"Processing failed: {error}",
+            "errorClass": "install",
+        }
+    )
     try:
         os.remove(zip_path)
     except Exception:
+        pass
+
+
+_INSTALL_BATCHER: Optional[InstallBatcher] = None
+_INSTALL_BATCHER_LOCK = threading.Lock()
+
+
+def _get_install_batcher() -> Optional[InstallBatcher]:
+    """Return the shared install stage, or None when zips are installed one by one."""
+    global _INSTALL_BATCHER
+    with _INSTALL_BATCHER_LOCK:
+        if _INSTALL_BATCHER is None:
+            try:
+                max_batch = int(get_setting("accela_batch_max", ACCELA_BATCH_MAX))
+                window = (
+                    float(get_setting("accela_batch_window_ms", ACCELA_BATCH_WINDOW_MS))
+                    / 1000.0
+                )
+            except Exception:
+                max_batch = ACCELA_BATCH_MAX
+                window = ACCELA_BATCH_WINDOW_MS / 1000.0
+            if max_batch <= 1:
+                return None
+            _INSTALL_BATCHER = InstallBatcher(
+                _process_and_install_lua, _finish_install, window, max_batch
+            )
+            logger.log(f"Cyberia: Batching up to {max_batch} zips per ACCELA run")
+        return _INSTALL_BATCHER
+
+
+def _get_race_stagger() -> Optional[float]:
+    """Return the delay between API probes, or None to probe one at a time."""
+    mode = str(get_setting("api_race_mode", API_RACE_MODE) or "").strip().lower()
+    if mode == "all":
+        return 0.0
+    if mode == "staggered":
         try:
-            for _ in range(3):
-                time.sleep(0.2)
-                try:
-                    os.remove(zip_path)
-                    break
-                except Exception:
-                    continue
+            delay_ms = float(get_setting("api_race_stagger_ms", API_RACE_STAGGER_MS))
+        except Exception:
+            delay_ms = API_RACE_STAGGER_MS
+        return max(0.0, delay_ms / 1000.0)
+    return None
+
+
+def _prepare_api_request(api: dict, appid: int) -> dict:
+    """Resolve the URL and headers used to ask one API for appid."""
+    name = api.get("name", "Unknown")
+    template = api.get("url", "")
+    api_key = api.get("api_key", "")
+
+    # Check if this is a Morrenus API and auto-fill API key from ACCELA
+    if "morrenus.xyz" in template.lower() and not api_key:
+        accela_key = get_accela_api_key()
+        if accela_key:
+            logger.log("Cyberia: Found Morrenus API key in ACCELA settings, using it")
+            api_key = accela_key
+
+    headers = {
+        "User-Agent": USER_AGENT,
+    }
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return {
+        "name": name,
+        "url": template.replace("<appid>", str(appid)),
+        "headers": headers,
+        "fingerprint": api_fingerprint(template, api.get("api_key", "")),
+        "pinned": bool(api.get("pinned", False)),
+        "retry": RetryPolicy.from_api(api),
+    }
+
+
+def _close_probe(probe: dict) -> None:
+    resp = probe.get("resp")
+    if resp is not None:
+        try:
+            resp.close()
         except Exception:
             pass
 
 
-def _is_download_cancelled(appid: int) -> bool:
+_RETRY_LOCK = threading.Lock()
+
+
+def _note_retry(job: DownloadJob, name: str, retry: int, delay: float, reason: str):
+    logger.log(
+        f"Cyberia: API '{name}' {reason}, retry {retry} in {delay:.2f}s for appid={job.appid}"
+    )
+    # Racing probes report from their own threads; keep the totals consistent.
+    with _RETRY_LOCK:
+        job.update(
+            {
+                "retries": job.extra.get("retries", 0) + 1,
+                "backoffMs": job.extra.get("backoffMs", 0) + int(delay * 1000),
+            }
+        )
+
+
+def _probe_api(
+    client, candidate: dict, job: DownloadJob, should_stop=None, aborter=None
+) -> dict:
+    """Open a streaming GET against one API and peek at the first body bytes.
+
+    When the API answers 200 with a zip signature, or 206 for a candidate that
+    carries a resume point, the response is left open so the download can
+    continue on the same connection; otherwise it is closed. A 304 for a
+    candidate with a cache entry also wins, with nothing left to stream.
+    Transient failures are retried per the candidate's retry policy until
+    should_stop() says the answer is no longer needed. aborter, a
+    RequestAborter, lets another thread cut the request off mid-flight.
+    """
+    name = candidate["name"]
+    resume_from = candidate.get("resume_from", 0)
+    logger.log(f"Cyberia: Trying API '{name}' -> {candidate['url']}")
+    request = client.build_request(
+        "GET",
+        candidate["url"],
+        headers=candidate["headers"],
+        extensions={"trace": aborter.trace} if aborter is not None else None,
+    )
+    prewarmed = is_warm(candidate["url"])
+    started = time.monotonic()
+
+    def on_retry(retry: int, delay: float, reason: str) -> None:
+        nonlocal started
+        _note_retry(job, name, retry, delay, reason)
+        # Time to first byte is measured on the attempt that answered.
+        started = time.monotonic() + delay
+
+    resp = send_with_retry(
+        client,
+        request,
+        candidate["retry"],
+        stream=True,
+        follow_redirects=True,
+        should_stop=should_stop,
+        on_retry=on_retry,
+    )
+    if aborter is not None:
+        aborter.attach(resp)
+    probe = {
+        "candidate": candidate,
+        "ok": False,
+        "code": resp.status_code,
+        "ttfb": max(0.0, time.monotonic() - started),
+        "prewarmed": prewarmed,
+    }
+    try:
+        logger.log(f"Cyberia: API '{name}' status={resp.status_code}")
+        if resp.status_code == 304 and candidate.get("cached"):
+            resp.close()
+            probe.update({"ok": True, "cached": candidate["cached"]})
+            return probe
+        if resp.status_code == 206 and resume_from:
+            content_range = resp.headers.get("Content-Range", "")
+            if not content_range.startswith(f"bytes {resume_from}-"):
+                logger.warn(
+                    f"Cyberia: API '{name}' sent unexpected range '{content_range}'"
+                )
+                resp.close()
+                probe["error_class"] = "bad_range"
+                return probe
+            logger.log(f"Cyberia: API '{name}' resuming at byte {resume_from}")
+            probe.update(
+                {
+                    "ok": True,
+                    "resp": resp,
+                    "chunks": resp.iter_bytes(),
+                    "head": b"",
+                    "offset": resume_from,
+                }
+            )
+            return probe
+        if resp.status_code != 200:
+            resp.close()
+            return probe
+
+        chunks = resp.iter_bytes()
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= 4:
+                break
+        if head[:4] not in ZIP_MAGICS:
+            preview = head[:50].decode("utf-8", errors="ignore")
+            logger.warn(
+                f"Cyberia: API '{name}' returned non-zip body (magic={head[:4].hex()}, preview={preview})"
+            )
+            resp.close()
+            probe["error_class"] = "non_zip"
+            return probe
+
+        probe.update({"ok": True, "resp": resp, "chunks": chunks, "head": head})
+        return probe
+    except Exception:
+        resp.close()
+        raise
+
+
+def _record_probe(probe: dict) -> None:
+    if probe.get("error_class") == SlotWaitAborted.error_class:
+        # The request never left the local slot queue; the API is not to blame.
+        get_circuit_breakers().release_probe(probe["candidate"]["name"])
+        return
+    if probe.get("ok"):
+        outcome = "ok"
+    elif probe.get("code") == 404:
+        outcome = "not_found"
+    else:
+        outcome = "error"
+    error_class = probe.get("error_class")
+    if outcome == "error" and error_class is None and probe.get("code"):
+        error_class = f"http_{probe['code']}"
+    name = probe["candidate"]["name"]
+    get_stats_tracker().record_probe(name, probe.get("ttfb"), outcome, error_class)
+    if outcome == "error":
+        get_circuit_breakers().record_failure(name, error_class)
+    else:
+        get_circuit_breakers().record_success(name)
+
+
+def _race_api_probes(
+    client, job: DownloadJob, candidates: list, stagger: Optional[float]
+):
+    """Probe candidates concurrently and return the first one serving a zip.
+
+    A new probe starts every `stagger` seconds (all at once for 0, strictly one
+    after another for None) and immediately whenever every in-flight probe has
+    failed. APIs whose circuit breaker is open are skipped and reported as
+    failed. Returns (winner, failed probes); probes still in flight when the
+    race is decided are cut off, and losers are closed as soon as they
+    complete.
+    """
+    results: "queue.Queue[dict]" = queue.Queue()
+    decided = threading.Event()
+    publish_lock = threading.Lock()
+    aborters: List[RequestAborter] = []
+
+    def run(candidate: dict, aborter: RequestAborter) -> None:
+        try:
+            probe = _probe_api(
+                client,
+                candidate,
+                job,
+                lambda: job.cancelled or decided.is_set(),
+                aborter,
+            )
+        except Exception as err:
+            if not aborter.aborted:
+                logger.warn(
+                    f"Cyberia: API '{candidate['name']}' failed with error: {err}"
+                )
+            probe = {
+                "candidate": candidate,
+                "ok": False,
+                "error": str(err),
+                "error_class": classify_error(err),
+            }
+        aborter.finish()
+        if aborter.aborted:
+            # A probe cut off by the race says nothing about the API.
+            get_circuit_breakers().release_probe(candidate["name"])
+        else:
+            _record_probe(probe)
+        with publish_lock:
+            if not decided.is_set():
+                results.put(probe)
+                return
+        _close_probe(probe)
+
+    breakers = get_circuit_breakers()
+    launched = 0
+    pending = 0
+    failed = []
+    winner = None
+    next_launch = time.monotonic()
+    while not job.cancelled:
+        now = time.monotonic()
+        if launched < len(candidates) and (pending == 0 or now >= next_launch):
+            candidate = candidates[launched]
+            launched += 1
+            if not breakers.allow(candidate["name"]):
+                logger.log(f"Cyberia: Skipping API '{candidate['name']}', circuit open")
+                failed.append(
+                    {"candidate": candidate, "ok": False, "error_class": "circuit_open"}
+                )
+                continue
+            pending += 1
+            job.update({"status": "checking", "currentApi": candidate["name"]})
+            aborter = RequestAborter()
+            aborters.append(aborter)
+            threading.Thread(
+                target=run,
+                args=(candidate, aborter),
+                name=f"cyberia-probe-{job.appid}",
+                daemon=True,
+            ).start()
+            next_launch = now + stagger if stagger is not None else float("inf")
+            continue
+        if pending == 0:
+            break
+
+        wait = 0.25
+        if launched < len(candidates):
+            wait = max(0.0, min(wait, next_launch - now))
+        try:
+            probe = results.get(timeout=wait)
+        except queue.Empty:
+            continue
+        pending -= 1
+        if probe.get("ok"):
+            winner = probe
+            break
+        failed.append(probe)
+
+    with publish_lock:
+        decided.set()
+    for aborter in aborters:
+        aborter.abort()
+    while True:
+        try:
+            _close_probe(results.get_nowait())
+        except queue.Empty:
+            break
+    return winner, failed
+
+
+def _write_journal(dest_path: str, entry: dict) -> None:
+    try:
+        save_journal(dest_path, entry)
+    except Exception as exc:
+        logger.warn(f"Cyberia: Failed to write download journal: {exc}")
+
+
+def _with_resume_point(candidate: dict, entry: dict) -> dict:
+    """Return a copy of candidate that asks for the bytes after entry's .part."""
+    validator = entry.get("etag") or ""
+    if not validator or validator.startswith("W/"):
+        # If-Range only accepts strong ETags; fall back to the date validator.
+        validator = entry.get("lastModified") or ""
+    if not validator:
+        return candidate
+    offset = int(entry["bytes"])
+    headers = dict(candidate["headers"])
+    headers["Range"] = f"bytes={offset}-"
+    headers["If-Range"] = validator
+    return {**candidate, "headers": headers, "resume_from": offset}
+
+
+def _without_resume_point(candidate: dict) -> dict:
+    """Return a copy of candidate that asks for the whole body again."""
+    headers = dict(candidate["headers"])
+    headers.pop("Range", None)
+    headers.pop("If-Range", None)
+    restart = {**candidate, "headers": headers}
+    restart.pop("resume_from", None)
+    return restart
+
+
+def _apply_resume_point(candidates: list, dest_path: str) -> list:
+    """Move the candidate that produced the journaled .part file to the front."""
+    entry = load_resume_point(dest_path)
+    if entry is None:
+        clear_partial(dest_path)
+        return candidates
+    for index, candidate in enumerate(candidates):
+        if candidate["name"] == entry.get("api") and candidate["url"] == entry.get(
+            "url"
+        ):
+            resumable = _with_resume_point(candidate, entry)
+            if resumable is candidate:
+                break
+            logger.log(
+                f"Cyberia: Found partial download ({entry['bytes']} bytes) from API '{candidate['name']}'"
+            )
+            return [resumable] + candidates[:index] + candidates[index + 1 :]
+    return candidates
+
+
+def _report_breakers(job: DownloadJob, candidates: list) -> None:
+    breakers = get_circuit_breakers()
+    states = dict(job.extra.get("breakers") or {})
+    for candidate in candidates:
+        states[candidate["name"]] = breakers.state(candidate["name"])
+    job.update({"breakers": states})
+
+
+def _skip_known_misses(job: DownloadJob, candidates: list) -> list:
+    """Drop APIs that recently answered 404 for this appid."""
+    negative = get_negative_cache()
+    remaining = []
+    skipped = []
+    for candidate in candidates:
+        if negative.is_unavailable(
+            candidate["name"], job.appid, candidate["fingerprint"]
+        ):
+            skipped.append(candidate["name"])
+        else:
+            remaining.append(candidate)
+    if skipped:
+        logger.log(
+            f"Cyberia: Skipping APIs with a recent 404 for appid={job.appid}: {', '.join(skipped)}"
+        )
+        job.update({"skippedApis": skipped})
+    return remaining
+
+
+def _apply_cache_validators(candidates: list, appid: int) -> list:
+    """Turn requests for cached manifests into conditional requests."""
+    cache = get_manifest_cache()
+    if not cache.enabled:
+        return candidates
+    prepared = []
+    for candidate in candidates:
+        entry = None
+        if not candidate.get("resume_from"):
+            entry = cache.lookup(appid, candidate["name"], candidate["url"])
+        if entry is None:
+            prepared.append(candidate)
+            continue
+        headers = dict(candidate["headers"])
+        headers.update(cache.conditional_headers(entry))
+        prepared.append({**candidate, "headers": headers, "cached": entry})
+    return prepared
+
+
+def _store_in_cache(
+    appid: int, candidate: dict, source: Union[str, bytes], validators: dict
+):
+    try:
+        if get_manifest_cache().store(
+            appid,
+            candidate["name"],
+            candidate["url"],
+            source,
+            validators.get("etag"),
+            validators.get("lastModified"),
+        ):
+            logger.log(f"Cyberia: Cached manifest for appid={appid}")
+    except Exception as exc:
+        logger.warn(f"Cyberia: Failed to cache manifest for appid={appid}: {exc}")
+
+
+def _new_zip_validator(resumed_part: Optional[str]):
+    """Create a streaming validator, seeded with an already downloaded prefix."""
+    if not get_setting("zip_stream_validation", ZIP_STREAM_VALIDATION):
+        return None
+    validator = StreamingZipValidator()
+    if resumed_part:
+        with open(resumed_part, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+                validator.feed(chunk)
+    return validator
+
+
+def _get_spool_limit() -> int:
+    try:
+        return max(
+            0, int(get_setting("download_spool_max_bytes", DOWNLOAD_SPOOL_MAX_BYTES))
+        )
+    except Exception:
+        return DOWNLOAD_SPOOL_MAX_BYTES
+
+
+# Smallest slice a throttled chunk is charged and written in.
+_THROTTLE_SLICE_MIN_BYTES = 4096
+
+
+def _get_stall_settings() -> Tuple[float, bool]:
+    """Return (seconds without bytes before a stall, whether to fail over)."""
     try:
-        return _get_download_state(appid).get("status") == "cancelled"
+        seconds = float(get_setting("download_stall_seconds", DOWNLOAD_STALL_SECONDS))
     except Exception:
-        return False
+        seconds = DOWNLOAD_STALL_SECONDS
+    failover = bool(get_setting("download_stall_failover", DOWNLOAD_STALL_FAILOVER))
+    return max(0.0, seconds), failover
+
+
+def _pump_body(job: DownloadJob, probe: dict, write, validator, checkpoint=None):
+    """Feed the probe's body to write(), honouring cancellation.
+
+    checkpoint, if given, is called every DOWNLOAD_JOURNAL_FLUSH_BYTES, and
+    progress, speed and ETA are published to status waiters every
+    JOB_PROGRESS_PUBLISH_SECONDS. A side thread flags the job as stalled when
+    no bytes arrive for download_stall_seconds; with failover enabled it also
+    cuts the connection so DownloadStalled is raised without waiting for the
+    read timeout. Every chunk is charged to the job's bandwidth bucket before
+    it is written; waiting for tokens does not count as a stall.
+    """
+    appid = job.appid
+    name = probe["candidate"]["name"]
+    cancel_event = job.cancel_event
+    marked = job.bytes_read
+    meter = TransferMeter(job.bytes_read, JOB_SPEED_WINDOW_SECONDS)
+    publish_at = time.monotonic() + JOB_PROGRESS_PUBLISH_SECONDS
+    stall_after, failover = _get_stall_settings()
+    limiter = get_bandwidth_limiter()
+    limiter.global_bucket.configure(*read_limit_settings())
+    bucket = limiter.bucket_for(appid)
+
+    def rate_field():
+        return {"rateLimitBps": int(bucket.rate) if bucket is not None else None}
+
+    job.update(rate_field())
+
+    def on_stall():
+        logger.warn(
+            f"Cyberia: API '{name}' stalled for appid={appid}, no data for {stall_after:g}s"
+        )
+        job.update({"stalled": True, "speedBps": 0, "etaSeconds": None})
+
+    def on_resume():
+        logger.log(f"Cyberia: API '{name}' resumed sending for appid={appid}")
+        job.update({"stalled": False})
+
+    watchdog = StallWatchdog(
+        f"cyberia-stall-{appid}",
+        lambda: job.bytes_read,
+        stall_after,
+        on_stall,
+        on_resume,
+        abort=(lambda: abort_stream(probe["resp"])) if failover else None,
+    )
+
+    def deliver(piece: bytes) -> None:
+        nonlocal bucket, marked, publish_at
+        if bucket is not None:
+            with watchdog.hold():
+                if not bucket.consume(len(piece), cancel_event):
+                    raise RuntimeError("cancelled")
+        if validator is not None:
+            validator.feed(piece)
+        write(piece)
+        job.bytes_read += len(piece)
+        now = time.monotonic()
+        if now >= publish_at:
+            # Pick up limits changed at runtime for this job.
+            bucket = limiter.bucket_for(appid)
+            job.update(
+                {**meter.fields(job.bytes_read, job.total_bytes), **rate_field()}
+            )
+            publish_at = now + JOB_PROGRESS_PUBLISH_SECONDS
+        if (
+            checkpoint is not None
+            and job.bytes_read - marked >= DOWNLOAD_JOURNAL_FLUSH_BYTES
+        ):
+            checkpoint()
+            marked = job.bytes_read
+
+    with watchdog:
+        try:
+            for chunk in itertools.chain((probe["head"],), probe["chunks"]):
+                if not chunk:
+                    continue
+                if cancel_event.is_set():
+                    logger.log(
+                        f"Cyberia: Download cancelled mid-stream for appid={appid}"
+                    )
+                    raise RuntimeError("cancelled")
+                step = len(chunk)
+                if bucket is not None:
+                    # Charge throttled chunks in slices so progress moves
+                    # smoothly instead of in one jump per network read.
+                    step = max(
+                        _THROTTLE_SLICE_MIN_BYTES,
+                        int(bucket.rate * JOB_PROGRESS_PUBLISH_SECONDS),
+                    )
+                for index in range(0, len(chunk), step):
+                    deliver(chunk[index : index + step])
+        except Exception as exc:
+            if watchdog.aborted and not cancel_event.is_set():
+                raise DownloadStalled(f"API '{name}' stalled") from exc
+            raise
+    if watchdog.aborted and (not job.total_bytes or job.bytes_read < job.total_bytes):
+        # Reading until close ends cleanly when the socket is shut down.
+        raise DownloadStalled(f"API '{name}' stalled")
+
+
+def _stream_probe(job: DownloadJob, probe: dict, dest_path: str):
+    """Download the winning probe's body. Returns (validators, body).
+
+    Fresh bodies whose Content-Length is within the spool limit are kept in
+    memory and body holds their bytes; nothing touches the disk until
+    ACCELA needs a path, unless the stream breaks and the bytes so far are
+    parked as a .part for the resume logic. Everything else goes to a .part
+    file whose journal is refreshed every DOWNLOAD_JOURNAL_FLUSH_BYTES and
+    whenever the stream stops, so a later attempt can pick up where this one
+    left off; it is renamed to dest_path when complete and body is None.
+    validators is the final journal entry, which carries the response
+    validators. When stream validation is enabled the archive structure and
+    member CRCs are checked as bytes arrive, so a corrupt body is rejected
+    before it reaches ACCELA.
+    """
+    resp = probe["resp"]
+    candidate = probe["candidate"]
+    offset = probe.get("offset", 0)
+    partial = part_path(dest_path)
+    try:
+        length = int(resp.headers.get("Content-Length", "0") or "0")
+        total = offset + length if length else 0
+        spooled = not offset and 0 < length <= _get_spool_limit()
+        job.update(
+            {
+                "status": "downloading",
+                "currentApi": candidate["name"],
+                "bytesRead": offset,
+                "totalBytes": total,
+                "resumedFrom": offset,
+                "spool": "memory" if spooled else "disk",
+                "speedBps": None,
+                "etaSeconds": None,
+                "stalled": False,
+            }
+        )
+        entry = {
+            "api": candidate["name"],
+            "url": candidate["url"],
+            "etag": resp.headers.get("ETag"),
+            "lastModified": resp.headers.get("Last-Modified"),
+            "bytes": offset,
+            "totalBytes": total,
+        }
+        validator = _new_zip_validator(partial if offset else None)
+        started = time.monotonic()
+
+        if spooled:
+            # A leftover .part from an earlier attempt is stale once another
+            # API serves the whole body.
+            clear_partial(dest_path)
+            body = bytearray()
+            try:
+                _pump_body(job, probe, body.extend, validator)
+            except ZipValidationError:
+                raise
+            except Exception:
+                if body and not job.cancelled:
+                    # Park what arrived so the retry can resume from it.
+                    with open(partial, "wb") as output:
+                        output.write(body)
+                    entry["bytes"] = len(body)
+                    _write_journal(dest_path, entry)
+                raise
+        else:
+            body = None
+            _write_journal(dest_path, entry)
+
+            def checkpoint():
+                output.flush()
+                entry["bytes"] = job.bytes_read
+                _write_journal(dest_path, entry)
+
+            with open(partial, "ab" if offset else "wb") as output:
+                try:
+                    _pump_body(job, probe, output.write, validator, checkpoint)
+                finally:
+                    checkpoint()
+
+        entry["bytes"] = job.bytes_read
+        get_stats_tracker().record_transfer(
+            candidate["name"], job.bytes_read - offset, time.monotonic() - started
+        )
+        if validator is not None:
+            validator.finish()
+            logger.log(
+                f"Cyberia: Verified {validator.entries} zip member(s) while streaming"
+            )
+        if body is not None:
+            return entry, body
+        os.replace(partial, dest_path)
+        clear_partial(dest_path)
+        return entry, None
+    except ZipValidationError as exc:
+        logger.warn(f"Cyberia: API '{candidate['name']}' sent a corrupt archive: {exc}")
+        clear_partial(dest_path)
+        raise
+    finally:
+        resp.close()
+
+
+def _spill_spooled_body(appid: int, body: bytes) -> str:
+    """Write an in-memory zip to a file ACCELA can open, on tmpfs if possible."""
+    path = os.path.join(ensure_spool_dir(), f"{appid}.zip")
+    with open(path, "wb") as handle:
+        handle.write(body)
+    return path
 
 
 def _download_zip_for_app(appid: int):
+    job = get_job(appid)
+    if job is None or job.cancelled:
+        logger.log(f"Cyberia: Skipping cancelled job for appid={appid}")
+        return
+
     client = ensure_http_client("Cyberia: download")
     apis = load_api_manifest()
     if not apis:
         logger.warn("Cyberia: No enabled APIs in manifest")
-        _set_download_state(appid, {"status": "failed", "error": "No APIs available"})
+        job.update(
+            {"status": "failed", "error": "No APIs available", "errorClass": "no_apis"}
+        )
         return
 
     dest_root = ensure_temp_download_dir()
     dest_path = os.path.join(dest_root, f"{appid}.zip")
-    _set_download_state(
-        appid,
+    job.update(
         {
             "status": "checking",
             "currentApi": None,
             "bytesRead": 0,
             "totalBytes": 0,
             "dest": dest_path,
-        },
+            "retries": 0,
+            "backoffMs": 0,
+            "speedBps": None,
+            "etaSeconds": None,
+            "stalled": False,
+        }
     )
 
-    for api in apis:
-        name = api.get("name", "Unknown")
-        template = api.get("url", "")
-        api_key = api.get("api_key", "")
+    candidates = [_prepare_api_request(api, appid) for api in apis]
+    candidates = _skip_known_misses(job, candidates)
+    candidates = get_stats_tracker().rank(candidates)
+    job.update({"apiOrder": [c["name"] for c in candidates]})
+    _report_breakers(job, candidates)
+    candidates = _apply_resume_point(candidates, dest_path)
+    candidates = _apply_cache_validators(candidates, appid)
+    stagger = _get_race_stagger()
+
+    negative = get_negative_cache()
+    while candidates:
+        winner, failed = _race_api_probes(client, job, candidates, stagger)
+        _report_breakers(job, candidates)
+        if job.cancelled:
+            logger.log(
+                f"Cyberia: Download cancelled while probing APIs for appid={appid}"
+            )
+            _close_probe(winner or {})
+            clear_partial(dest_path)
+            return
 
-        # Check if this is a Morrenus API and auto-fill API key from ACCELA
-        if "morrenus.xyz" in template.lower() and not api_key:
-            accela_key = get_accela_api_key()
-            if accela_key:
+        restarts = []
+        for probe in failed:
+            candidate = probe["candidate"]
+            if probe.get("code") == 416 and candidate.get("resume_from"):
+                # The journaled range no longer exists upstream; start over
+                # with a plain request to the same API.
                 logger.log(
-                    "Cyberia: Found Morrenus API key in ACCELA settings, using it"
+                    f"Cyberia: API '{candidate['name']}' rejected the resume range, restarting"
                 )
-                api_key = accela_key
+                clear_partial(dest_path)
+                restarts.extend(
+                    _apply_cache_validators([_without_resume_point(candidate)], appid)
+                )
+            elif probe.get("code") == 404:
+                negative.remember(candidate["name"], appid, candidate["fingerprint"])
 
-        success_code = 200
-        unavailable_code = 404
-        url = template.replace("<appid>", str(appid))
-        _set_download_state(
-            appid,
-            {"status": "checking", "currentApi": name, "bytesRead": 0, "totalBytes": 0},
+        # Losers that were still in flight stay eligible if the winner fails later.
+        dropped = {id(p["candidate"]) for p in failed}
+        if winner is not None:
+            dropped.add(id(winner["candidate"]))
+        candidates = restarts + [c for c in candidates if id(c) not in dropped]
+        if winner is None:
+            continue
+
+        name = winner["candidate"]["name"]
+        job.update(
+            {
+                "ttfbMs": round(winner["ttfb"] * 1000.0, 1),
+                "prewarmed": winner["prewarmed"],
+            }
         )
-        logger.log(f"Cyberia: Trying API '{name}' -> {url}")
+        validators = None
+        body = None
+        zip_path = dest_path
         try:
-            logger.log(f"Trying with key: Bearer {api_key}")
-            headers = {
-                "User-Agent": USER_AGENT,
-            }
-            if api_key:
-                headers["Authorization"] = f"Bearer {api_key}"
-            if _is_download_cancelled(appid):
-                logger.log(
-                    f"Cyberia: Download cancelled before contacting API '{name}'"
-                )
-                return
-            with client.stream(
-                "GET", url, headers=headers, follow_redirects=True
-            ) as resp:
-                code = resp.status_code
-                logger.log(f"Cyberia: API '{name}' status={code}")
-                if code == unavailable_code:
-                    continue
-                if code != success_code:
-                    continue
-                total = int(resp.headers.get("Content-Length", "0") or "0")
-                _set_download_state(
-                    appid,
-                    {"status": "downloading", "bytesRead": 0, "totalBytes": total},
+            if winner.get("cached"):
+                logger.log(f"Cyberia: API '{name}' confirmed cached manifest")
+                get_manifest_cache().materialize(winner["cached"], dest_path)
+                size = int(winner["cached"].get("size", 0))
+                job.update(
+                    {
+                        "status": "downloading",
+                        "currentApi": name,
+                        "bytesRead": size,
+                        "totalBytes": size,
+                        "cache": "hit",
+                    }
                 )
-                with open(dest_path, "wb") as output:
-                    for chunk in resp.iter_bytes():
-                        if not chunk:
-                            continue
-                        if _is_download_cancelled(appid):
-                            logger.log(
-                                f"Cyberia: Download cancelled mid-stream for appid={appid}"
-                            )
-                            raise RuntimeError("cancelled")
-                        output.write(chunk)
-                        state = _get_download_state(appid)
-                        read = int(state.get("bytesRead", 0)) + len(chunk)
-                        _set_download_state(appid, {"bytesRead": read})
-                        if _is_download_cancelled(appid):
-                            logger.log(
-                                f"Cyberia: Download cancelled after writing chunk for appid={appid}"
-                            )
-                            raise RuntimeError("cancelled")
-                logger.log(f"Cyberia: Download complete -> {dest_path}")
-
-                if _is_download_cancelled(appid):
+            else:
+                validators, body = _stream_probe(job, winner, dest_path)
+                job.update({"cache": "miss"})
+                if body is None:
+                    logger.log(f"Cyberia: Download complete -> {dest_path}")
+                else:
                     logger.log(
-                        f"Cyberia: Download marked cancelled after completion for appid={appid}"
+                        f"Cyberia: Download complete, {len(body)} bytes held in memory"
                     )
-                    raise RuntimeError("cancelled")
 
-                try:
-                    with open(dest_path, "rb") as fh:
-                        magic = fh.read(4)
-                        if magic not in (b"PK\x03\x04", b"PK\x05\x06", b"PK\x07\x08"):
-                            file_size = os.path.getsize(dest_path)
-                            with open(dest_path, "rb") as check_f:
-                                preview = check_f.read(512)
-                                content_preview = preview[:100].decode(
-                                    "utf-8", errors="ignore"
-                                )
-                            logger.warn(
-                                f"Cyberia: API '{name}' returned non-zip file (magic={magic.hex()}, size={file_size}, preview={content_preview[:50]})"
-                            )
-                            try:
-                                os.remove(dest_path)
-                            except Exception:
-                                pass
-                            continue
-                except FileNotFoundError:
-                    logger.warn("Cyberia: Downloaded file not found after download")
-                    continue
-                except Exception as validation_exc:
-                    logger.warn(
-                        f"Cyberia: File validation failed for API '{name}': {validation_exc}"
-                    )
-                    try:
-                        os.remove(dest_path)
-                    except Exception:
-                        pass
-                    continue
+            if job.cancelled:
+                logger.log(
+                    f"Cyberia: Download marked cancelled after completion for appid={appid}"
+                )
+                raise RuntimeError("cancelled")
 
-                try:
-                    if _is_download_cancelled(appid):
-                        logger.log(
-                            f"Cyberia: Processing aborted due to cancellation for appid={appid}"
-                        )
-                        raise RuntimeError("cancelled")
-                    _set_download_state(appid, {"status": "processing"})
-                    _process_and_install_lua(appid, dest_path)
-                    if _is_download_cancelled(appid):
-                        logger.log(
-                            f"Cyberia: Installation complete but marked cancelled for appid={appid}"
-                        )
-                        raise RuntimeError("cancelled")
-                    _set_download_state(
-                        appid, {"status": "done", "success": True, "api": name}
-                    )
-                    return
-                except Exception as install_exc:
-                    if (
-                        isinstance(install_exc, RuntimeError)
-                        and str(install_exc) == "cancelled"
-                    ):
-                        try:
-                            if os.path.exists(dest_path):
-                                os.remove(dest_path)
-                        except Exception:
-                            pass
-                        logger.log(
-                            f"Cyberia: Cancelled download cleanup complete for appid={appid}"
-                        )
-                        return
-                    logger.warn(f"Cyberia: Processing failed -> {install_exc}")
-                    _set_download_state(
-                        appid,
-                        {
-                            "status": "failed",
-                            "error": f"Processing failed: {install_exc}",
-                        },
-                    )
-                    try:
-                        os.remove(dest_path)
-                    except Exception:
-                        pass
+            if validators is not None:
+                _store_in_cache(
+                    appid,
+                    winner["candidate"],
+                    dest_path if body is None else body,
+                    validators,
+                )
+
+            if job.cancelled:
+                logger.log(
+                    f"Cyberia: Processing aborted due to cancellation for appid={appid}"
+                )
+                raise RuntimeError("cancelled")
+            job.update({"status": "processing"})
+            try:
+                if body is not None:
+                    zip_path = _spill_spooled_body(appid, body)
+                    job.update({"dest": zip_path})
+                batcher = _get_install_batcher()
+                if batcher is not None:
+                    # The install stage reports the outcome; free this worker
+                    # for the next download meanwhile.
+                    batcher.submit(job, zip_path, name)
                     return
+                _process_and_install_lua([job], [zip_path])
+            except Exception as install_exc:
+                _finish_install(job, zip_path, name, install_exc)
+                return
+            _finish_install(job, zip_path, name, None)
+            return
         except RuntimeError as cancel_exc:
             if str(cancel_exc) == "cancelled":
                 try:
-                    if os.path.exists(dest_path):
-                        os.remove(dest_path)
+                    if os.path.exists(zip_path):
+                        os.remove(zip_path)
                 except Exception:
                     pass
+                clear_partial(dest_path)
                 logger.log(
                     f"Cyberia: Download cancelled and cleaned up for appid={appid}"
                 )
@@ -436,28 +1097,331 @@ def _download_zip_for_app(appid: int):
             logger.warn(
                 f"Cyberia: Runtime error during download for appid={appid}: {cancel_exc}"
             )
-            _set_download_state(appid, {"status": "failed", "error": str(cancel_exc)})
+            job.update(
+                {
+                    "status": "failed",
+                    "error": str(cancel_exc),
+                    "errorClass": classify_error(cancel_exc),
+                }
+            )
             return
         except Exception as err:
             logger.warn(f"Cyberia: API '{name}' failed with error: {err}")
+            get_stats_tracker().record_failure(name, classify_error(err))
+            get_circuit_breakers().record_failure(name, classify_error(err))
+            entry = load_resume_point(dest_path)
+            if (
+                entry is not None
+                and entry.get("url") == winner["candidate"]["url"]
+                and job.bytes_read > winner.get("offset", 0)
+            ):
+                # The stream broke after making progress; ask the same API for
+                # the rest before falling back to the others.
+                retry = _with_resume_point(winner["candidate"], entry)
+                if retry.get("resume_from"):
+                    if isinstance(err, DownloadStalled):
+                        # Give the other APIs a go first; the stalled one
+                        # can still finish the transfer if they all miss.
+                        candidates.append(retry)
+                    else:
+                        candidates.insert(0, retry)
             continue
 
-    _set_download_state(
-        appid, {"status": "failed", "error": "Not available on any API"}
+    job.update(
+        {
+            "status": "failed",
+            "error": "Not available on any API",
+            "errorClass": "unavailable",
+        }
     )
 
 
-def start_add_via_cyberia(appid: int) -> str:
+def _run_download_job(appid: int) -> None:
+    job = get_job(appid)
+    try:
+        _download_zip_for_app(appid)
+    finally:
+        get_stats_tracker().flush()
+        # A per-job rate applies to one run only; leave it alone if the
+        # appid was re-added with its own rate while this run wound down.
+        if get_job(appid) is job:
+            get_bandwidth_limiter().set_override(appid, None)
+
+
+def _parse_rate(value) -> Optional[int]:
+    """Bytes per second from an RPC argument; None or "" means no value."""
+    if value is None or value == "":
+        return None
+    rate = int(float(value))
+    if rate < 0:
+        raise ValueError("rate must not be negative")
+    return rate
+
+
+def _enqueue_add(
+    appid: int, priority: int, rate_limit: Optional[int] = None
+) -> Tuple[Optional[DownloadJob], bool, str]:
+    """Queue appid, or coalesce onto its run in flight. Returns (job, coalesced, error).
+
+    rate_limit, if given, overrides the global bandwidth limit for this run.
+    A job that has already finished is never coalesced onto, even while its
+    worker is still winding down; the new run is queued behind it instead.
+    """
+    if rate_limit is not None:
+        get_bandwidth_limiter().set_override(appid, rate_limit)
+    priority = normalize_priority(priority)
+    scheduler = _get_scheduler()
+    batcher = _get_install_batcher()
+    job = get_job(appid)
+    active = scheduler.is_active(appid)
+    if (job is None or not job.finished) and (
+        active or (batcher is not None and batcher.is_pending(appid))
+    ):
+        if job is not None and job.cancelled:
+            return None, False, "Previous run is still being cancelled"
+        if active:
+            # Re-submitting may still raise the priority of a queued job. A
+            # job waiting only on the install batch is past its download.
+            scheduler.submit(appid, priority)
+            if job is not None and priority < job.extra.get("priority", priority + 1):
+                job.update({"priority": priority})
+        logger.log(f"Cyberia: appid={appid} already in flight, coalescing request")
+        return job, True, ""
+
+    job = create_job(appid)
+    job.update({"priority": priority})
+    try:
+        scheduler.submit(appid, priority, rerun=True)
+    except Exception as exc:
+        job.update({"status": "failed", "error": str(exc), "errorClass": "scheduler"})
+        return None, False, str(exc)
+    return job, False, ""
+
+
+# Stored states of a run that was cut short by an unload or crash.
+_RECOVERABLE_STATUSES = (
+    "queued",
+    "checking",
+    "downloading",
+    "processing",
+    "installing",
+)
+_APPID_FILE = re.compile(r"^(\d+)\.zip")
+
+
+def _remove_orphaned_files(keep) -> int:
+    """Delete per-appid files in temp_dl and the spool dir not owned by keep.
+
+    A .part file with a usable journal is kept along with the journal, so a
+    later add of that appid resumes it even though its job ended failed.
+    """
+    removed = 0
+    temp_root = ensure_temp_download_dir()
+    for root in {temp_root, ensure_spool_dir()}:
+        try:
+            names = os.listdir(root)
+        except Exception:
+            continue
+        for name in names:
+            match = _APPID_FILE.match(name)
+            if match is None or int(match.group(1)) in keep:
+                continue
+            if root == temp_root and name.endswith((PART_SUFFIX, JOURNAL_SUFFIX)):
+                dest_path = os.path.join(root, f"{match.group(1)}.zip")
+                if load_resume_point(dest_path) is not None:
+                    continue
+            try:
+                os.remove(os.path.join(root, name))
+                removed += 1
+            except Exception as exc:
+                logger.warn(f"Cyberia: Failed to remove orphaned file {name}: {exc}")
+    return removed
+
+
+def recover_jobs() -> List[int]:
+    """Requeue the jobs an earlier run left unfinished and tidy up after it.
+
+    Called once when the plugin loads. Interrupted downloads keep their .part
+    files so they resume where they stopped, as do failed ones with a usable
+    journal; other files in temp_dl and the spool dir that belong to no
+    recovered or current job are deleted, and rows of finished jobs are
+    dropped from the store. Returns the requeued appids.
+    """
+    try:
+        store = get_job_store()
+        rows = store.load()
+    except Exception as exc:
+        logger.warn(f"Cyberia: Failed to read job store: {exc}")
+        return []
+
+    with JOBS_LOCK:
+        current = set(JOBS)
+    pending = [
+        row
+        for row in rows
+        if row["status"] in _RECOVERABLE_STATUSES and row["appid"] not in current
+    ]
+    store.delete(
+        [row["appid"] for row in rows if row["status"] not in _RECOVERABLE_STATUSES]
+    )
+    removed = _remove_orphaned_files(current | {row["appid"] for row in pending})
+
+    recovered = []
+    for row in pending:
+        priority = row["priority"] if row["priority"] is not None else PRIORITY_NORMAL
+        job, _, error = _enqueue_add(row["appid"], priority)
+        if job is None:
+            logger.warn(
+                f"Cyberia: Could not requeue appid={row['appid']} after restart: {error}"
+            )
+            continue
+        job.update({"recovered": True, "recoveredFrom": row["status"]})
+        recovered.append(row["appid"])
+    if recovered or removed:
+        logger.log(
+            f"Cyberia: Recovered {len(recovered)} interrupted job(s), removed {removed} orphaned file(s)"
+        )
+    return recovered
+
+
+def stop_downloads() -> None:
+    """Stop starting downloads, e.g. on plugin unload.
+
+    Queued jobs are dropped from the scheduler but keep their "queued" row in
+    the job store, so recover_jobs picks them up on the next load.
+    """
+    with _SCHEDULER_LOCK:
+        scheduler = _SCHEDULER
+    if scheduler is not None:
+        scheduler.shutdown()
+
+
+def wait_for_downloads(timeout: float) -> int:
+    """Wait for running downloads to return; return how many still run."""
+    with _SCHEDULER_LOCK:
+        scheduler = _SCHEDULER
+    if scheduler is None:
+        return 0
+    running = scheduler.wait_idle(timeout)
+    if running:
+        logger.warn(f"Cyberia: {running} download(s) still running at shutdown")
+    return running
+
+
+def start_add_via_cyberia(
+    appid: int, priority: int = PRIORITY_NORMAL, rate_limit=None
+) -> str:
     try:
         appid = int(appid)
+        rate_limit = _parse_rate(rate_limit)
     except Exception:
-        return json.dumps({"success": False, "error": "Invalid appid"})
+        return json.dumps({"success": False, "error": "Invalid appid or rate limit"})
 
     logger.log(f"Cyberia: StartAddViaCyberia appid={appid}")
-    _set_download_state(appid, {"status": "queued", "bytesRead": 0, "totalBytes": 0})
-    thread = threading.Thread(target=_download_zip_for_app, args=(appid,), daemon=True)
-    thread.start()
-    return json.dumps({"success": True})
+    job, coalesced, error = _enqueue_add(appid, priority, rate_limit)
+    if job is None:
+        return json.dumps({"success": False, "error": error})
+    return json.dumps({"success": True, "coalesced": coalesced})
+
+
+def _parse_appids(appids) -> List:
+    """Accept a list, a JSON array string or a comma separated string."""
+    if isinstance(appids, str):
+        text = appids.strip()
+        if text.startswith("["):
+            appids = json.loads(text)
+        else:
+            appids = [part for part in text.split(",") if part.strip()]
+    if not isinstance(appids, (list, tuple)):
+        raise ValueError("appids must be a list")
+    return list(appids)
+
+
+_BATCHES: Dict[str, dict] = {}
+_BATCHES_LOCK = threading.Lock()
+
+
+def start_add_batch(appids, priority: int = PRIORITY_NORMAL) -> str:
+    """Queue many appids at once and return a batch id for get_batch_status."""
+    try:
+        requested = _parse_appids(appids)
+    except Exception as exc:
+        return json.dumps({"success": False, "error": f"Invalid appids: {exc}"})
+
+    jobs: Dict[int, DownloadJob] = {}
+    rejected = []
+    for raw in requested:
+        try:
+            appid = int(raw)
+        except Exception:
+            rejected.append({"appid": raw, "error": "Invalid appid"})
+            continue
+        if appid in jobs:
+            continue
+        job, _, error = _enqueue_add(appid, priority)
+        if job is None:
+            rejected.append({"appid": appid, "error": error})
+        else:
+            jobs[appid] = job
+    if not jobs:
+        return json.dumps(
+            {"success": False, "error": "No appids queued", "rejected": rejected}
+        )
+
+    batch_id = uuid.uuid4().hex[:12]
+    with _BATCHES_LOCK:
+        _BATCHES[batch_id] = {"jobs": jobs, "createdAt": time.time()}
+        while len(_BATCHES) > BATCH_HISTORY_MAX:
+            del _BATCHES[next(iter(_BATCHES))]
+    logger.log(f"Cyberia: StartAddBatch id={batch_id} appids={len(jobs)}")
+    return json.dumps(
+        {
+            "success": True,
+            "batchId": batch_id,
+            "appids": list(jobs),
+            "rejected": rejected,
+        }
+    )
+
+
+def get_batch_status(batch_id: str) -> str:
+    """Aggregate counts, byte totals and per-item states for one batch."""
+    with _BATCHES_LOCK:
+        batch = _BATCHES.get(str(batch_id))
+    if batch is None:
+        return json.dumps({"success": False, "error": "Unknown batch"})
+
+    counts: Dict[str, int] = {}
+    items = {}
+    bytes_read = 0
+    total_bytes = 0
+    for appid, job in batch["jobs"].items():
+        state = job.snapshot()
+        items[str(appid)] = state
+        status = state.get("status") or "unknown"
+        counts[status] = counts.get(status, 0) + 1
+        bytes_read += state.get("bytesRead") or 0
+        total_bytes += state.get("totalBytes") or 0
+    finished = sum(counts.get(s, 0) for s in ("done", "failed", "cancelled"))
+    return json.dumps(
+        {
+            "success": True,
+            "batchId": str(batch_id),
+            "total": len(items),
+            "finished": finished == len(items),
+            "counts": counts,
+            "bytesRead": bytes_read,
+            "totalBytes": total_bytes,
+            "items": items,
+        }
+    )
+
+
+def _job_state(job: Optional[DownloadJob]) -> dict:
+    state = job.snapshot() if job is not None else {}
+    if state.get("status") == "queued":
+        state["queuePosition"] = _get_scheduler().position(job.appid)
+    return state
 
 
 def get_add_status(appid: int) -> str:
@@ -465,8 +1429,104 @@ def get_add_status(appid: int) -> str:
         appid = int(appid)
     except Exception:
         return json.dumps({"success": False, "error": "Invalid appid"})
-    state = _get_download_state(appid)
-    return json.dumps({"success": True, "state": state})
+    return json.dumps({"success": True, "state": _job_state(get_job(appid))})
+
+
+def wait_add_status(
+    appid: int, since_seq: int = 0, timeout: float = STATUS_WAIT_DEFAULT_SECONDS
+) -> str:
+    """Long-poll variant of get_add_status.
+
+    Blocks until appid's job has changed after since_seq or timeout seconds
+    pass (capped at STATUS_WAIT_MAX_SECONDS). The response carries the seq to
+    pass on the next call and whether anything changed.
+    """
+    try:
+        appid = int(appid)
+        since_seq = int(since_seq or 0)
+        timeout = min(max(float(timeout), 0.0), STATUS_WAIT_MAX_SECONDS)
+    except Exception:
+        return json.dumps({"success": False, "error": "Invalid arguments"})
+    job = wait_for_job(appid, since_seq, timeout)
+    seq = job.seq if job is not None else 0
+    return json.dumps(
+        {
+            "success": True,
+            "state": _job_state(job),
+            "seq": seq,
+            "changed": seq != since_seq,
+        }
+    )
+
+
+def get_all_statuses(since_seq: int = 0) -> str:
+    """Report every job that changed after since_seq in one compact payload.
+
+    Job fields use the short names from jobs.SHORT_KEYS (listed under
+    ``keys`` on a full resync); see jobs.changes_since for how ``gone`` and
+    ``full`` are applied.
+    """
+    try:
+        since_seq = int(since_seq or 0)
+    except Exception:
+        return json.dumps({"success": False, "error": "Invalid since_seq"})
+    changes = changes_since(since_seq)
+    payload = {"success": True, **changes}
+    if changes["full"]:
+        payload["keys"] = SHORT_KEYS
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def get_history(limit: int = HISTORY_DEFAULT_LIMIT) -> str:
+    """Return the most recent finished jobs, newest first."""
+    try:
+        limit = max(0, int(limit))
+    except Exception:
+        return json.dumps({"success": False, "error": "Invalid limit"})
+    return json.dumps({"success": True, "history": get_job_history().recent(limit)})
+
+
+def get_download_rate_limit() -> str:
+    return json.dumps({"success": True, **get_bandwidth_limiter().snapshot()})
+
+
+def set_download_rate_limit(rate_bps, burst_bytes=None, appid=None) -> str:
+    """Change the bandwidth limit at runtime.
+
+    Without appid the global limit is changed and saved to settings.json;
+    with appid only that job's run is affected, and a rate of None drops its
+    override again. A rate of 0 means unlimited.
+    """
+    try:
+        rate = _parse_rate(rate_bps)
+        burst = _parse_rate(burst_bytes)
+        appid = int(appid) if appid not in (None, "") else None
+    except Exception:
+        return json.dumps({"success": False, "error": "Invalid rate limit"})
+
+    limiter = get_bandwidth_limiter()
+    if appid is not None:
+        limiter.set_override(appid, rate, burst)
+        logger.log(f"Cyberia: Rate limit for appid={appid} set to {rate} B/s")
+        job = get_job(appid)
+        if job is not None and not job.finished:
+            bucket = limiter.bucket_for(appid)
+            job.update(
+                {"rateLimitBps": int(bucket.rate) if bucket is not None else None}
+            )
+        return get_download_rate_limit()
+
+    if rate is None:
+        return json.dumps({"success": False, "error": "Missing rate"})
+    limiter.global_bucket.configure(rate, burst)
+    logger.log(f"Cyberia: Global download rate limit set to {rate} B/s")
+    settings = load_settings()
+    settings["download_rate_limit_bps"] = rate
+    if burst is not None:
+        settings["download_burst_bytes"] = burst
+    if not save_settings(settings):
+        return json.dumps({"success": False, "error": "Failed to save settings"})
+    return get_download_rate_limit()
 
 
 def cancel_add_via_cyberia(appid: int) -> str:
@@ -475,13 +1535,73 @@ def cancel_add_via_cyberia(appid: int) -> str:
     except Exception:
         return json.dumps({"success": False, "error": "Invalid appid"})
 
-    state = _get_download_state(appid)
-    if not state or state.get("status") in {"done", "failed"}:
+    job = get_job(appid)
+    if job is None or job.status in {"done", "failed"}:
         return json.dumps({"success": True, "message": "Nothing to cancel"})
 
-    _set_download_state(appid, {"status": "cancelled", "error": "Cancelled by user"})
+    job.cancel()
+    _get_scheduler().discard(appid)
     logger.log(f"Cyberia: Cancellation requested for appid={appid}")
     return json.dumps({"success": True})
 
 
-__all__ = ["cancel_add_via_cyberia", "get_add_status", "start_add_via_cyberia"]
+def get_api_stats() -> str:
+    """Report per-API statistics and the order the next download would use."""
+    try:
+        tracker = get_stats_tracker()
+        stats = tracker.snapshot()
+        candidates = [
+            {"name": api.get("name", "Unknown"), "pinned": bool(api.get("pinned"))}
+            for api in load_api_manifest()
+        ]
+        apis = []
+        for rank, candidate in enumerate(tracker.rank(candidates), start=1):
+            name = candidate["name"]
+            cost = tracker.expected_cost(name)
+            if candidate["pinned"]:
+                reason = "pinned"
+            elif cost is None:
+                reason = "unmeasured"
+            else:
+                reason = "expected cost"
+            apis.append(
+                {
+                    "name": name,
+                    "rank": rank,
+                    "pinned": candidate["pinned"],
+                    "reason": reason,
+                    "expectedCostMs": (
+                        round(cost * 1000.0, 1) if cost is not None else None
+                    ),
+                    "stats": stats.get(name),
+                }
+            )
+        return json.dumps(
+            {
+                "success": True,
+                "apis": apis,
+                "prewarm": prewarm_snapshot(),
+                "dns": get_dns_cache().snapshot(),
+            }
+        )
+    except Exception as exc:
+        logger.warn(f"Cyberia: GetApiStats failed: {exc}")
+        return json.dumps({"success": False, "error": str(exc)})
+
+
+__all__ = [
+    "cancel_add_via_cyberia",
+    "get_add_status",
+    "get_all_statuses",
+    "get_api_stats",
+    "get_batch_status",
+    "get_download_rate_limit",
+    "get_history",
+    "recover_jobs",
+    "set_download_rate_limit",
+    "start_add_batch",
+    "start_add_via_cyberia",
+    "stop_downloads",
+    "wait_add_status",
+    "wait_for_downloads",
+]
@@ -0,0 +1,92 @@
+"""Append-only history of finished Cyberia jobs."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from config import HISTORY_FILE, HISTORY_MAX_ENTRIES
+from logger import logger
+from paths import backend_path
+
+
+class JobHistory:
+    """Ring of the last ``max_entries`` finished jobs, persisted as JSON lines.
+
+    Each finished job appends one line to the file, so recording a result
+    never rewrites what is already there. Once the file holds twice the ring
+    size it is compacted down to the ring's contents.
+    """
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self._path = path
+        self._max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=self._max_entries)
+        self._lines = 0
+        self._load()
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries.append(entry)
+            try:
+                with open(self._path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                self._lines += 1
+                if self._lines > 2 * self._max_entries:
+                    self._compact_locked()
+            except Exception as exc:
+                logger.warn(f"Cyberia: Failed to write job history: {exc}")
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return up to limit entries, newest first."""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if limit is not None:
+            entries = entries[: max(0, int(limit))]
+        return entries
+
+    def _load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    self._lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append.
+                        continue
+                    if isinstance(entry, dict):
+                        self._entries.append(entry)
+        except Exception as exc:
+            logger.warn(f"Cyberia: Failed to read job history: {exc}")
+
+    def _compact_locked(self) -> None:
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            for entry in self._entries:
+                handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self._path)
+        self._lines = len(self._entries)
+
+
+_HISTORY: Optional[JobHistory] = None
+_HISTORY_LOCK = threading.Lock()
+
+
+def get_job_history() -> JobHistory:
+    """Return the shared job history, creating it on first use."""
+    global _HISTORY
+    with _HISTORY_LOCK:
+        if _HISTORY is None:
+            _HISTORY = JobHistory(backend_path(HISTORY_FILE), HISTORY_MAX_ENTRIES)
+        return _HISTORY
+
+
+__all__ = ["JobHistory", "get_job_history"]
@@ -1,6 +1,14 @@
 """Shared HTTP client management for the Cyberia backend."""
 
-from typing import Optional
+import email.utils
+import ipaddress
+import queue
+import random
+import socket
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 try:
     import httpx  # type: ignore
@@ -20,14 +28,529 @@ except ImportError:
     httpx_available = False
     httpx_import_error = "httpx module not found"
 
-from config import HTTP_TIMEOUT_SECONDS
+try:
+    import h2  # type: ignore  # noqa: F401
+
+    http2_available = True
+except ImportError:
+    http2_available = False
+
+from config import (
+    DNS_CACHE_ENABLED,
+    DNS_CACHE_STALE_SECONDS,
+    DNS_CACHE_TTL_SECONDS,
+    HAPPY_EYEBALLS_DELAY_SECONDS,
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_DRAIN_TIMEOUT_SECONDS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_POOL_TIMEOUT_SECONDS,
+    HTTP_RETRY_AFTER_MAX_SECONDS,
+    HTTP_RETRY_ATTEMPTS,
+    HTTP_RETRY_BASE_MS,
+    HTTP_RETRY_CAP_MS,
+    HTTP_RETRY_STATUSES,
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_WRITE_TIMEOUT_SECONDS,
+)
 from logger import logger
 
 _HTTP_CLIENT: Optional["HTTPXClient"] = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+
+# Interval at which a caller waiting for a host slot is asked whether to give up.
+_SLOT_POLL_SECONDS = 0.25
+
+
+class SlotWaitAborted(Exception):
+    """Raised when a request gave up waiting for a free slot to its host.
+
+    The request never reached the host, so error_class marks it as local
+    queueing rather than an API failure.
+    """
+
+    error_class = "slot_wait"
+
+
+class _InFlight:
+    """Open requests per host, capped at ``per_host`` at a time.
+
+    A streamed response holds its slot until it is closed, so the cap also
+    bounds the connections one host can tie up. A caller that passes
+    should_stop waits for a slot until should_stop() returns True; others
+    give up after ``pool_timeout``. Either way SlotWaitAborted is raised.
+    """
+
+    def __init__(self, per_host: int, pool_timeout: float) -> None:
+        self._per_host = max(1, int(per_host))
+        self._pool_timeout = pool_timeout
+        self._cond = threading.Condition()
+        self._hosts: Dict[str, int] = {}
+        self._count = 0
+
+    def acquire(
+        self, host: str, should_stop: Optional[Callable[[], bool]] = None
+    ) -> None:
+        deadline = time.monotonic() + self._pool_timeout
+        with self._cond:
+            while self._hosts.get(host, 0) >= self._per_host:
+                if should_stop is not None:
+                    if should_stop():
+                        raise SlotWaitAborted(f"Gave up waiting for a slot to {host}")
+                    self._cond.wait(_SLOT_POLL_SECONDS)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SlotWaitAborted(f"No free connection slot for {host}")
+                self._cond.wait(remaining)
+            self._hosts[host] = self._hosts.get(host, 0) + 1
+            self._count += 1
+
+    def release(self, host: str) -> None:
+        with self._cond:
+            self._hosts[host] -= 1
+            if not self._hosts[host]:
+                del self._hosts[host]
+            self._count -= 1
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> int:
+        """Wait until nothing is in flight; return how many still are."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while self._count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._count
+
+
+class DnsCache:
+    """Cached getaddrinfo answers per host name.
+
+    getaddrinfo does not expose record TTLs, so answers are trusted for
+    ``ttl`` seconds. After that, for up to ``stale`` more seconds, the old
+    addresses are still handed out while one background lookup refreshes
+    them, so a slow resolver (typically right after wake-from-sleep) only
+    delays requests for hosts that were never resolved.
+    """
+
+    def __init__(self, ttl: float, stale: float) -> None:
+        self._ttl = max(0.0, float(ttl))
+        self._stale = max(0.0, float(stale))
+        self._lock = threading.Lock()
+        # host -> {"addresses": [(family, ip)], "resolvedAt": monotonic}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._refreshing: set = set()
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "refreshes": 0}
+
+    def resolve(self, host: str) -> List[Tuple[int, str]]:
+        """Return (family, ip) pairs for host in the resolver's preferred order."""
+        try:
+            literal = ipaddress.ip_address(host)
+        except ValueError:
+            pass
+        else:
+            family = socket.AF_INET6 if literal.version == 6 else socket.AF_INET
+            return [(family, host)]
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(host)
+            age = now - entry["resolvedAt"] if entry else None
+            if entry is not None and age < self._ttl:
+                self._counters["hits"] += 1
+                return list(entry["addresses"])
+            if entry is not None and age < self._ttl + self._stale:
+                self._counters["stale"] += 1
+                if host not in self._refreshing:
+                    self._refreshing.add(host)
+                    threading.Thread(
+                        target=self._refresh,
+                        args=(host,),
+                        name="cyberia-dns",
+                        daemon=True,
+                    ).start()
+                return list(entry["addresses"])
+            self._counters["misses"] += 1
+        return self._lookup(host)
+
+    def forget(self, host: str) -> None:
+        with self._lock:
+            self._entries.pop(host, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                **self._counters,
+                "hosts": {
+                    host: {
+                        "addresses": [ip for _, ip in entry["addresses"]],
+                        "ageSeconds": round(now - entry["resolvedAt"], 1),
+                    }
+                    for host, entry in self._entries.items()
+                },
+            }
+
+    def _lookup(self, host: str) -> List[Tuple[int, str]]:
+        infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses: List[Tuple[int, str]] = []
+        for family, _, _, _, sockaddr in infos:
+            if (family, sockaddr[0]) not in addresses:
+                addresses.append((family, sockaddr[0]))
+        with self._lock:
+            self._entries[host] = {
+                "addresses": addresses,
+                "resolvedAt": time.monotonic(),
+            }
+        return list(addresses)
+
+    def _refresh(self, host: str) -> None:
+        try:
+            self._lookup(host)
+            with self._lock:
+                self._counters["refreshes"] += 1
+        except Exception as exc:
+            logger.warn(f"Cyberia: Background DNS refresh for {host} failed: {exc}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(host)
+
+
+_DNS_CACHE = DnsCache(DNS_CACHE_TTL_SECONDS, DNS_CACHE_STALE_SECONDS)
+
+
+def get_dns_cache() -> DnsCache:
+    return _DNS_CACHE
+
+
+def _interleave_families(addresses: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Alternate address families, starting with the resolver's first choice."""
+    if not addresses:
+        return []
+    first = [a for a in addresses if a[0] == addresses[0][0]]
+    other = [a for a in addresses if a[0] != addresses[0][0]]
+    ordered = []
+    for index in range(max(len(first), len(other))):
+        ordered.extend(group[index] for group in (first, other) if index < len(group))
+    return ordered
+
+
+def _close_late_streams(results: "queue.Queue", pending: int) -> None:
+    for _ in range(pending):
+        _, stream, _ = results.get()
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+if httpx_available:
+    import httpcore  # type: ignore
+
+    class _CachingNetworkBackend(httpcore.SyncBackend):
+        """TCP connects that resolve through the DnsCache and race addresses.
+
+        Connection attempts start HAPPY_EYEBALLS_DELAY_SECONDS apart (or as
+        soon as the previous one fails), alternating IPv6 and IPv4, and the
+        first to connect wins (RFC 8305). TLS still uses the host name.
+        """
+
+        def __init__(self, cache: DnsCache, delay: float) -> None:
+            self._cache = cache
+            self._delay = delay
+
+        def connect_tcp(
+            self,
+            host: str,
+            port: int,
+            timeout: Optional[float] = None,
+            local_address: Optional[str] = None,
+            socket_options=None,
+        ):
+            try:
+                addresses = _interleave_families(self._cache.resolve(host))
+            except OSError as exc:
+                raise httpcore.ConnectError(str(exc)) from exc
+            connect = super().connect_tcp
+            if len(addresses) == 1:
+                return connect(
+                    addresses[0][1], port, timeout, local_address, socket_options
+                )
+
+            results: "queue.Queue" = queue.Queue()
+
+            def attempt(ip: str) -> None:
+                try:
+                    stream = connect(ip, port, timeout, local_address, socket_options)
+                except Exception as exc:
+                    results.put((ip, None, exc))
+                else:
+                    results.put((ip, stream, None))
+
+            started = pending = 0
+            winner = None
+            last_error: Optional[BaseException] = None
+            next_start = time.monotonic()
+            while True:
+                now = time.monotonic()
+                if started < len(addresses) and (pending == 0 or now >= next_start):
+                    threading.Thread(
+                        target=attempt,
+                        args=(addresses[started][1],),
+                        name="cyberia-connect",
+                        daemon=True,
+                    ).start()
+                    started += 1
+                    pending += 1
+                    next_start = now + self._delay
+                    continue
+                if pending == 0:
+                    break
+                wait = None
+                if started < len(addresses):
+                    wait = max(0.0, next_start - now)
+                try:
+                    _, stream, error = results.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                pending -= 1
+                if stream is not None:
+                    winner = stream
+                    break
+                last_error = error
+            if pending:
+                threading.Thread(
+                    target=_close_late_streams,
+                    args=(results, pending),
+                    name="cyberia-connect",
+                    daemon=True,
+                ).start()
+            if winner is None:
+                # Every address failed; look the host up again next time.
+                self._cache.forget(host)
+                raise last_error
+            return winner
+
+    class _ResolvingTransport(httpx.HTTPTransport):
+        """Default transport whose connection pool connects via _CachingNetworkBackend."""
+
+        def __init__(self, limits, http2: bool) -> None:
+            super().__init__(limits=limits, http2=http2)
+            self._pool = httpcore.ConnectionPool(
+                ssl_context=httpx.create_ssl_context(),
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=limits.keepalive_expiry,
+                http1=True,
+                http2=http2,
+                network_backend=_CachingNetworkBackend(
+                    _DNS_CACHE, HAPPY_EYEBALLS_DELAY_SECONDS
+                ),
+            )
+
+    class _ReleasingStream(httpx.SyncByteStream):
+        """Response body that gives its host slot back when it is closed."""
+
+        def __init__(self, stream, release: Callable[[], None]) -> None:
+            self._stream = stream
+            self._release = release
+
+        def __iter__(self):
+            return iter(self._stream)
+
+        def close(self) -> None:
+            try:
+                self._stream.close()
+            finally:
+                release, self._release = self._release, None
+                if release is not None:
+                    release()
+
+    class _PooledClient(HTTPXClient):
+        """httpx client that tracks open requests for per-host caps and draining."""
+
+        def __init__(self, in_flight: _InFlight, **kwargs) -> None:
+            super().__init__(**kwargs)
+            self.in_flight = in_flight
+
+        def send(self, request, *, stream: bool = False, should_stop=None, **kwargs):
+            host = f"{request.url.scheme}://{request.url.host}:{request.url.port}"
+            self.in_flight.acquire(host, should_stop)
+            try:
+                response = super().send(request, stream=stream, **kwargs)
+            except BaseException:
+                self.in_flight.release(host)
+                raise
+            if not stream:
+                self.in_flight.release(host)
+                return response
+            response.stream = _ReleasingStream(
+                response.stream, lambda: self.in_flight.release(host)
+            )
+            return response
+
+
+class RetryPolicy:
+    """When and how long to wait before re-sending an idempotent request.
+
+    Connection-level failures (refused or reset connections, a peer that
+    hangs up before answering) and the statuses in ``statuses`` are retried
+    up to ``attempts`` tries in total. The n-th wait is drawn uniformly from
+    ``[0, min(cap, base * 2**n)]`` ("full jitter"), unless the server sent a
+    Retry-After, which is honoured as long as it is at most
+    ``retry_after_max`` seconds; a longer one ends the retries.
+    """
+
+    def __init__(
+        self,
+        attempts: int = HTTP_RETRY_ATTEMPTS,
+        base: float = HTTP_RETRY_BASE_MS / 1000.0,
+        cap: float = HTTP_RETRY_CAP_MS / 1000.0,
+        retry_after_max: float = HTTP_RETRY_AFTER_MAX_SECONDS,
+        statuses=HTTP_RETRY_STATUSES,
+    ) -> None:
+        self.attempts = max(1, int(attempts))
+        self.base = max(0.0, float(base))
+        self.cap = max(0.0, float(cap))
+        self.retry_after_max = max(0.0, float(retry_after_max))
+        self.statuses = frozenset(int(code) for code in statuses)
+
+    @classmethod
+    def from_api(cls, api: Dict[str, Any]) -> "RetryPolicy":
+        """Build the policy for one api_list entry and its optional "retry" object.
+
+        ``"retry": false`` turns retries off for that API; otherwise the keys
+        attempts, base_ms, cap_ms, retry_after_max_ms and statuses override
+        the defaults.
+        """
+        options = api.get("retry")
+        if options is False:
+            return cls(attempts=1)
+        if not isinstance(options, dict):
+            return cls()
+        try:
+            return cls(
+                attempts=options.get("attempts", HTTP_RETRY_ATTEMPTS),
+                base=options.get("base_ms", HTTP_RETRY_BASE_MS) / 1000.0,
+                cap=options.get("cap_ms", HTTP_RETRY_CAP_MS) / 1000.0,
+                retry_after_max=options.get(
+                    "retry_after_max_ms", HTTP_RETRY_AFTER_MAX_SECONDS * 1000
+                )
+                / 1000.0,
+                statuses=options.get("statuses", HTTP_RETRY_STATUSES),
+            )
+        except Exception as exc:
+            logger.warn(
+                f"Cyberia: Invalid retry settings for API '{api.get('name')}': {exc}"
+            )
+            return cls()
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter delay before the given retry (0 for the first)."""
+        return random.uniform(0.0, min(self.cap, self.base * (2**retry)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _is_transient(exc: BaseException) -> bool:
+    return isinstance(exc, (httpx.NetworkError, httpx.RemoteProtocolError))
+
+
+def send_with_retry(
+    client,
+    request,
+    policy: RetryPolicy,
+    *,
+    stream: bool = False,
+    should_stop: Optional[Callable[[], bool]] = None,
+    on_retry: Optional[Callable[[int, float, str], None]] = None,
+    **kwargs,
+):
+    """client.send() with retries for transient failures.
+
+    on_retry(retry_number, delay, reason) is called before each wait. The
+    wait is cut short, and the last outcome returned or raised, as soon as
+    should_stop() returns True; a response returned that way is already
+    closed. should_stop also bounds the wait for a free slot to the host,
+    so client must be the shared client from ensure_http_client when it is
+    given. Only use this for idempotent requests.
+    """
+    if should_stop is not None:
+        kwargs["should_stop"] = should_stop
+    retry = 0
+    while True:
+        try:
+            response = client.send(request, stream=stream, **kwargs)
+        except Exception as exc:
+            if not _is_transient(exc) or retry + 1 >= policy.attempts:
+                raise
+            delay = policy.backoff(retry)
+            reason = type(exc).__name__
+            outcome = exc
+        else:
+            if response.status_code not in policy.statuses:
+                return response
+            if retry + 1 >= policy.attempts:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > policy.retry_after_max:
+                return response
+            delay = policy.backoff(retry) if retry_after is None else retry_after
+            reason = f"http_{response.status_code}"
+            # Free the connection while waiting; the status stays readable.
+            response.close()
+            outcome = response
+
+        retry += 1
+        if on_retry is not None:
+            on_retry(retry, delay, reason)
+        deadline = time.monotonic() + delay
+        while True:
+            if should_stop is not None and should_stop():
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                return outcome
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(0.1, remaining))
 
 
 def ensure_http_client(context: str = "") -> "HTTPXClient":
-    """Create the shared HTTP client if needed and return it."""
+    """Create the shared HTTP client if needed and return it.
+
+    The pool keeps up to HTTP_MAX_KEEPALIVE_CONNECTIONS idle connections for
+    HTTP_KEEPALIVE_EXPIRY_SECONDS and never opens more than
+    HTTP_MAX_CONNECTIONS, or HTTP_MAX_CONNECTIONS_PER_HOST to one host.
+    Connect, read, write and pool waits have their own timeouts. HTTP/2 is
+    negotiated when the h2 package is installed. Host names are resolved
+    through the shared DnsCache, except when a proxy is configured in the
+    environment and does the resolving itself.
+    """
     global _HTTP_CLIENT
 
     if not httpx_available:
@@ -40,30 +563,67 @@ def ensure_http_client(context: str = "") -> "HTTPXClient":
         logger.error(error_msg)
         raise ImportError(error_msg)
 
-    if _HTTP_CLIENT is None:
-        prefix = f"{context}: " if context else ""
-        logger.log(f"{prefix}Initializing shared HTTPX client...")
-        try:
-            _HTTP_CLIENT = HTTPXClient(timeout=HTTP_TIMEOUT_SECONDS)
-            logger.log(f"{prefix}HTTPX client initialized")
-        except Exception as exc:
-            logger.error(f"{prefix}Failed to initialize HTTPX client: {exc}")
-            raise
-    return _HTTP_CLIENT
+    with _HTTP_CLIENT_LOCK:
+        if _HTTP_CLIENT is None:
+            prefix = f"{context}: " if context else ""
+            logger.log(f"{prefix}Initializing shared HTTPX client...")
+            try:
+                http2 = HTTP2_ENABLED and http2_available
+                limits = httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                )
+                options: Dict[str, Any] = {}
+                if DNS_CACHE_ENABLED and not urllib.request.getproxies():
+                    # A custom transport replaces the environment proxy
+                    # mounts, so it is only used when there are none.
+                    options["transport"] = _ResolvingTransport(limits, http2)
+                _HTTP_CLIENT = _PooledClient(
+                    _InFlight(HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_POOL_TIMEOUT_SECONDS),
+                    timeout=httpx.Timeout(
+                        connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+                        read=HTTP_TIMEOUT_SECONDS,
+                        write=HTTP_WRITE_TIMEOUT_SECONDS,
+                        pool=HTTP_POOL_TIMEOUT_SECONDS,
+                    ),
+                    limits=limits,
+                    http2=http2,
+                    **options,
+                )
+                logger.log(
+                    f"{prefix}HTTPX client initialized ({'HTTP/2' if http2 else 'HTTP/1.1'})"
+                )
+            except Exception as exc:
+                logger.error(f"{prefix}Failed to initialize HTTPX client: {exc}")
+                raise
+        return _HTTP_CLIENT
 
 
-def close_http_client(context: str = "") -> None:
-    """Close and dispose of the shared HTTP client."""
+def close_http_client(
+    context: str = "", drain_timeout: float = HTTP_DRAIN_TIMEOUT_SECONDS
+) -> None:
+    """Close and dispose of the shared HTTP client.
+
+    The client is detached first so new callers get a fresh one, then
+    requests and streamed responses still in flight get up to drain_timeout
+    seconds to finish before the connections are closed.
+    """
     global _HTTP_CLIENT
-    if _HTTP_CLIENT is None:
+    with _HTTP_CLIENT_LOCK:
+        client, _HTTP_CLIENT = _HTTP_CLIENT, None
+    if client is None:
         return
 
+    prefix = f"{context}: " if context else ""
     try:
-        _HTTP_CLIENT.close()
+        remaining = client.in_flight.wait_idle(drain_timeout)
+        if remaining:
+            logger.warn(
+                f"{prefix}Closing HTTPX client with {remaining} request(s) still open"
+            )
+        client.close()
     except Exception:
         pass
     finally:
-        _HTTP_CLIENT = None
-        prefix = f"{context}: " if context else ""
         logger.log(f"{prefix}HTTPX client closed")
-
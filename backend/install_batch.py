@@ -0,0 +1,126 @@
+"""Install stage that hands finished manifest zips to ACCELA in batches."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Set
+
+from logger import logger
+
+
+class InstallBatcher:
+    """Collect finished downloads and install them with as few ACCELA runs as possible.
+
+    The first zip to arrive opens a window of ``window`` seconds; everything
+    submitted before it closes, up to ``max_batch`` zips, goes to a single
+    ``runner(jobs, zip_paths)`` call. If a batch of several zips fails, each
+    zip is retried on its own so the failure lands on the right appid.
+    ``on_result(job, zip_path, api_name, error)`` is called exactly once per
+    submitted zip with None or the exception that failed it.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[list, List[str]], None],
+        on_result: Callable[
+            [object, str, Optional[str], Optional[BaseException]], None
+        ],
+        window: float,
+        max_batch: int,
+        name: str = "cyberia-install",
+    ) -> None:
+        self._runner = runner
+        self._on_result = on_result
+        self._window = max(0.0, float(window))
+        self._max_batch = max(1, int(max_batch))
+        self._name = name
+        self._cond = threading.Condition()
+        self._queue: Deque[dict] = deque()
+        self._pending: Set[int] = set()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def max_batch(self) -> int:
+        return self._max_batch
+
+    def submit(self, job, zip_path: str, api_name: Optional[str]) -> None:
+        with self._cond:
+            self._queue.append({"job": job, "zip": zip_path, "api": api_name})
+            self._pending.add(job.appid)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=self._name, daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def is_pending(self, appid: int) -> bool:
+        """Return True while appid is waiting for or inside an ACCELA run."""
+        with self._cond:
+            return appid in self._pending
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = time.monotonic() + self._window
+                while len(self._queue) < self._max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                count = min(len(self._queue), self._max_batch)
+                batch = [self._queue.popleft() for _ in range(count)]
+            try:
+                self._install(batch)
+            except Exception as exc:
+                logger.warn(f"Cyberia: Install stage failed: {exc}")
+
+    def _install(self, batch: List[dict]) -> None:
+        ready = []
+        for item in batch:
+            if item["job"].cancelled:
+                self._finish(item, RuntimeError("cancelled"))
+            else:
+                ready.append(item)
+        if not ready:
+            return
+
+        if len(ready) > 1:
+            logger.log(f"Cyberia: Installing {len(ready)} zips with one ACCELA run")
+        try:
+            self._runner([i["job"] for i in ready], [i["zip"] for i in ready])
+        except Exception as exc:
+            if len(ready) == 1:
+                self._finish(ready[0], exc)
+                return
+            logger.warn(
+                f"Cyberia: Batched ACCELA run failed ({exc}); retrying zips one by one"
+            )
+            for item in ready:
+                try:
+                    self._runner([item["job"]], [item["zip"]])
+                except Exception as single_exc:
+                    self._finish(item, single_exc)
+                else:
+                    self._finish(item, None)
+            return
+        for item in ready:
+            self._finish(item, None)
+
+    def _finish(self, item: dict, error: Optional[BaseException]) -> None:
+        try:
+            self._on_result(item["job"], item["zip"], item["api"], error)
+        except Exception as exc:
+            logger.warn(
+                f"Cyberia: Failed to record install result for appid={item['job'].appid}: {exc}"
+            )
+        finally:
+            with self._cond:
+                self._pending.discard(item["job"].appid)
+
+
+__all__ = ["InstallBatcher"]
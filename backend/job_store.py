@@ -0,0 +1,189 @@
+"""SQLite record of Cyberia jobs so queued work survives a plugin reload."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import JOB_STORE_FILE, JOB_STORE_FLUSH_SECONDS
+from logger import logger
+from paths import backend_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    appid INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER,
+    api TEXT,
+    dest TEXT,
+    error TEXT,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+)
+"""
+
+_UPSERT = """
+INSERT INTO jobs (appid, status, priority, api, dest, error, bytes, total_bytes, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(appid) DO UPDATE SET
+    status = excluded.status,
+    priority = excluded.priority,
+    api = excluded.api,
+    dest = excluded.dest,
+    error = excluded.error,
+    bytes = excluded.bytes,
+    total_bytes = excluded.total_bytes,
+    updated_at = excluded.updated_at
+"""
+
+_COLUMNS = (
+    "appid",
+    "status",
+    "priority",
+    "api",
+    "dest",
+    "error",
+    "bytes",
+    "total_bytes",
+    "updated_at",
+)
+
+
+class JobStore:
+    """Latest state of every job, kept in a WAL-mode SQLite database.
+
+    ``mark(job)`` only notes that a job changed; a writer thread waits
+    ``flush_interval`` seconds after the first mark and then writes every
+    marked job's current state in one transaction. A job that changes many
+    times in between costs a single row write, and byte counters are never
+    a reason to write on their own.
+    """
+
+    def __init__(self, path: str, flush_interval: float) -> None:
+        self._path = path
+        self._flush_interval = max(0.0, float(flush_interval))
+        self._cond = threading.Condition()
+        self._db_lock = threading.Lock()
+        # appid -> job to write, or None to delete the row.
+        self._pending: Dict[int, Any] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def mark(self, job) -> None:
+        self._queue(job.appid, job)
+
+    def forget(self, appid: int) -> None:
+        self._queue(appid, None)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Return every stored job row, oldest update first."""
+        with self._db_lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs ORDER BY updated_at"
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def delete(self, appids) -> None:
+        with self._db_lock:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM jobs WHERE appid = ?", [(a,) for a in appids]
+                )
+
+    def flush(self) -> None:
+        """Write everything marked so far, on the calling thread."""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        upserts = []
+        deletes = []
+        now = time.time()
+        for appid, job in pending.items():
+            if job is None:
+                deletes.append((appid,))
+            else:
+                upserts.append(_row(job, now))
+        try:
+            with self._db_lock:
+                with self._conn:
+                    if deletes:
+                        self._conn.executemany(
+                            "DELETE FROM jobs WHERE appid = ?", deletes
+                        )
+                    if upserts:
+                        self._conn.executemany(_UPSERT, upserts)
+        except Exception as exc:
+            logger.warn(f"Cyberia: Failed to write job store: {exc}")
+
+    def close(self) -> None:
+        self.flush()
+        with self._db_lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+    def _queue(self, appid: int, job) -> None:
+        with self._cond:
+            self._pending[appid] = job
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="cyberia-job-store", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self._flush_interval)
+            self.flush()
+
+
+def _row(job, now: float) -> tuple:
+    return (
+        job.appid,
+        job.status,
+        job.extra.get("priority"),
+        job.api or job.current_api,
+        job.dest,
+        job.error,
+        job.bytes_read,
+        job.total_bytes,
+        now,
+    )
+
+
+_STORE: Optional[JobStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Return the shared job store, creating it on first use."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = JobStore(backend_path(JOB_STORE_FILE), JOB_STORE_FLUSH_SECONDS)
+        return _STORE
+
+
+def close_job_store() -> None:
+    """Flush pending writes and close the database, e.g. on plugin unload."""
+    global _STORE
+    with _STORE_LOCK:
+        store, _STORE = _STORE, None
+    if store is not None:
+        store.close()
+
+
+__all__ = ["JobStore", "close_job_store", "get_job_store"]
@@ -0,0 +1,418 @@
+"""Per-appid job objects tracking Cyberia add/download progress."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+from config import (
+    JOB_FINISHED_TTL_SECONDS,
+    JOB_PRUNE_INTERVAL_SECONDS,
+    JOB_TABLE_MAX,
+    JOB_TOMBSTONES_MAX,
+)
+from history import get_job_history
+from job_store import get_job_store
+from logger import logger
+from settings import get_setting
+
+# Snapshot key -> attribute for the fields that get a dedicated slot. Anything
+# else passed to DownloadJob.update() lands in the job's ``extra`` dict.
+_SLOT_FIELDS = {
+    "status": "status",
+    "currentApi": "current_api",
+    "bytesRead": "bytes_read",
+    "totalBytes": "total_bytes",
+    "dest": "dest",
+    "error": "error",
+    "success": "success",
+    "api": "api",
+    "installedPath": "installed_path",
+}
+
+# Fields that are always present in a snapshot, even when unset.
+_ALWAYS_REPORTED = ("status", "bytesRead", "totalBytes")
+
+# Fields whose changes are written to the job store. Byte counters and other
+# live figures are saved alongside them but never trigger a write.
+_PERSISTED_FIELDS = frozenset(
+    {"status", "currentApi", "dest", "error", "api", "installedPath", "priority"}
+)
+
+# Compact names used by get_all_statuses; other keys are sent unchanged.
+SHORT_KEYS = {
+    "status": "s",
+    "currentApi": "c",
+    "bytesRead": "b",
+    "totalBytes": "t",
+    "dest": "d",
+    "error": "e",
+    "success": "ok",
+    "api": "a",
+    "installedPath": "p",
+    "seq": "q",
+}
+
+# Global state version. Every published job change takes the next number, so
+# a client holding the seq of its last snapshot can wait for anything newer.
+_SEQ = 0
+STATE_CHANGED = threading.Condition()
+
+# (seq, appid) of jobs dropped from JOBS, newest last. Deltas requested from
+# before _TOMBSTONE_FLOOR cannot be answered incrementally any more.
+_TOMBSTONES: Deque[Tuple[int, int]] = deque()
+_TOMBSTONE_FLOOR = 0
+
+
+class DownloadJob:
+    """Mutable state of one add/download run.
+
+    The download loop owns the job and bumps ``bytes_read`` directly without
+    taking a lock; cancellation is signalled through ``cancel_event`` so the
+    hot path only has to read a flag. Status transitions and other rare
+    updates go through ``update()``, and pollers get a plain dict from
+    ``snapshot()`` only when they ask for one.
+
+    Every ``update()`` and ``cancel()`` that changes something stamps the
+    job, and each changed field, with a new global sequence number and wakes
+    long-polling waiters; the download loop calls ``publish_progress()``
+    periodically for its lock-free byte counter. ``delta()`` uses the
+    per-field stamps to report only what changed after a given seq.
+    Changes to the fields in ``_PERSISTED_FIELDS`` also mark the job for the
+    job store, so it can be requeued after a reload.
+    """
+
+    __slots__ = (
+        "appid",
+        "status",
+        "current_api",
+        "bytes_read",
+        "total_bytes",
+        "dest",
+        "error",
+        "success",
+        "api",
+        "installed_path",
+        "seq",
+        "created_seq",
+        "created_at",
+        "finished_at",
+        "status_times",
+        "extra",
+        "cancel_event",
+        "_lock",
+        "_changed",
+        "_published_bytes",
+    )
+
+    def __init__(self, appid: int, status: str = "queued") -> None:
+        self.appid = appid
+        self.status = status
+        self.current_api: Optional[str] = None
+        self.bytes_read = 0
+        self.total_bytes = 0
+        self.dest: Optional[str] = None
+        self.error: Optional[str] = None
+        self.success: Optional[bool] = None
+        self.api: Optional[str] = None
+        self.installed_path: Optional[str] = None
+        self.seq = 0
+        self.created_seq = 0
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.status_times: Dict[str, float] = {}
+        self.extra: Dict[str, Any] = {}
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._changed: Dict[str, int] = {}
+        self._published_bytes = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in {"done", "failed", "cancelled"}
+
+    def update(self, fields: Dict[str, Any]) -> None:
+        """Apply a status-dict style update, e.g. ``{"status": "checking"}``."""
+        changed = []
+        with self._lock:
+            for key, value in fields.items():
+                attr = _SLOT_FIELDS.get(key)
+                if attr is not None:
+                    if getattr(self, attr) != value:
+                        setattr(self, attr, value)
+                        changed.append(key)
+                elif key not in self.extra or self.extra[key] != value:
+                    self.extra[key] = value
+                    changed.append(key)
+        self._publish(changed)
+
+    def cancel(self, error: str = "Cancelled by user") -> None:
+        with self._lock:
+            self.status = "cancelled"
+            self.error = error
+        self.cancel_event.set()
+        self._publish(("status", "error"))
+
+    def publish_progress(self) -> None:
+        """Publish bytes_read written directly by the download loop."""
+        self._publish(())
+
+    def _publish(self, changed: Iterable[str]) -> None:
+        global _SEQ
+        just_finished = False
+        persist = False
+        with STATE_CHANGED:
+            changed = set(changed)
+            if self.bytes_read != self._published_bytes:
+                self._published_bytes = self.bytes_read
+                changed.add("bytesRead")
+            if not changed and self.seq:
+                return
+            _SEQ += 1
+            self.seq = _SEQ
+            if not self.created_seq:
+                self.created_seq = _SEQ
+            for key in changed:
+                self._changed[key] = _SEQ
+            persist = not changed.isdisjoint(_PERSISTED_FIELDS)
+            if "status" in changed:
+                now = time.monotonic()
+                self.status_times.setdefault(self.status, now)
+                if self.finished and self.finished_at is None:
+                    self.finished_at = now
+                    just_finished = True
+            STATE_CHANGED.notify_all()
+        if persist:
+            try:
+                get_job_store().mark(self)
+            except Exception as exc:
+                logger.warn(
+                    f"Cyberia: Failed to persist job for appid={self.appid}: {exc}"
+                )
+        if just_finished:
+            try:
+                get_job_history().append(self.history_entry())
+            except Exception as exc:
+                logger.warn(
+                    f"Cyberia: Failed to record history for appid={self.appid}: {exc}"
+                )
+
+    def history_entry(self) -> Dict[str, Any]:
+        """Summarise a finished job for the history ring."""
+
+        def span(start: Optional[float], end: Optional[float]) -> Optional[int]:
+            if start is None or end is None:
+                return None
+            return int((end - start) * 1000)
+
+        times = self.status_times
+        finished = self.finished_at
+        started = times.get("checking")
+        download_end = times.get("processing") or times.get("installing") or finished
+        error_class = None
+        if self.status == "cancelled":
+            error_class = "cancelled"
+        elif self.status == "failed":
+            error_class = self.extra.get("errorClass") or "unknown"
+        return {
+            "appid": self.appid,
+            "status": self.status,
+            "api": self.api or self.current_api,
+            "bytes": self.bytes_read,
+            "totalBytes": self.total_bytes,
+            "queueMs": span(self.created_at, started or finished),
+            "downloadMs": span(started, download_end),
+            "installMs": span(times.get("installing"), finished),
+            "totalMs": span(self.created_at, finished),
+            "errorClass": error_class,
+            "ttfbMs": self.extra.get("ttfbMs"),
+            "prewarmed": self.extra.get("prewarmed"),
+            "finishedAt": round(time.time(), 3),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the job as the JSON-ready dict reported by get_add_status."""
+        with self._lock:
+            state: Dict[str, Any] = {}
+            for key, attr in _SLOT_FIELDS.items():
+                value = getattr(self, attr)
+                if value is not None or key in _ALWAYS_REPORTED:
+                    state[key] = value
+            state.update(self.extra)
+            state["seq"] = self.seq
+        return state
+
+    def delta(self, since_seq: int) -> Optional[Dict[str, Any]]:
+        """Return the fields changed after since_seq under SHORT_KEYS names.
+
+        A job created after since_seq is sent whole with ``"n": 1`` so the
+        client replaces rather than merges it. Fields cleared since then are
+        sent as None. Returns None when nothing changed.
+        """
+        with STATE_CHANGED:
+            if self.seq <= since_seq:
+                return None
+            full = self.created_seq > since_seq
+            keys = [key for key, seq in self._changed.items() if seq > since_seq]
+        state = self.snapshot()
+        if full:
+            record = {SHORT_KEYS.get(key, key): value for key, value in state.items()}
+            record["n"] = 1
+            return record
+        record = {SHORT_KEYS.get(key, key): state.get(key) for key in keys}
+        record["q"] = state["seq"]
+        return record
+
+
+JOBS: Dict[int, DownloadJob] = {}
+JOBS_LOCK = threading.Lock()
+
+
+def get_job(appid: int) -> Optional[DownloadJob]:
+    with JOBS_LOCK:
+        return JOBS.get(appid)
+
+
+def create_job(appid: int) -> DownloadJob:
+    """Register a fresh queued job for appid, replacing any previous run."""
+    job = DownloadJob(appid)
+    with JOBS_LOCK:
+        JOBS[appid] = job
+    job.publish_progress()
+    prune_jobs()
+    return job
+
+
+def evict_job(appid: int, job: Optional[DownloadJob] = None) -> bool:
+    """Drop appid's job from the table and leave a tombstone for delta clients.
+
+    With job given, nothing happens if appid has been re-added since.
+    """
+    global _SEQ, _TOMBSTONE_FLOOR
+    with JOBS_LOCK:
+        current = JOBS.get(appid)
+        if current is None or (job is not None and current is not job):
+            return False
+        del JOBS[appid]
+    try:
+        get_job_store().forget(appid)
+    except Exception as exc:
+        logger.warn(f"Cyberia: Failed to drop stored job for appid={appid}: {exc}")
+    with STATE_CHANGED:
+        _SEQ += 1
+        _TOMBSTONES.append((_SEQ, appid))
+        while len(_TOMBSTONES) > JOB_TOMBSTONES_MAX:
+            _TOMBSTONE_FLOOR = _TOMBSTONES.popleft()[0]
+        STATE_CHANGED.notify_all()
+    return True
+
+
+_LAST_PRUNE = 0.0
+_TABLE_CAP = JOB_TABLE_MAX
+
+
+def prune_jobs(force: bool = False) -> int:
+    """Evict finished jobs past their TTL and enforce the table cap.
+
+    Runs at most every JOB_PRUNE_INTERVAL_SECONDS unless forced or the
+    table is over its cap. Jobs that have not finished are never evicted;
+    over the cap, the longest-finished ones go first. Returns the number
+    of jobs evicted.
+    """
+    global _LAST_PRUNE, _TABLE_CAP
+    now = time.monotonic()
+    with JOBS_LOCK:
+        if (
+            not force
+            and len(JOBS) <= _TABLE_CAP
+            and now - _LAST_PRUNE < JOB_PRUNE_INTERVAL_SECONDS
+        ):
+            return 0
+        _LAST_PRUNE = now
+    try:
+        ttl = float(get_setting("job_ttl_seconds", JOB_FINISHED_TTL_SECONDS))
+        cap = max(1, int(get_setting("job_table_max", JOB_TABLE_MAX)))
+    except Exception:
+        ttl, cap = JOB_FINISHED_TTL_SECONDS, JOB_TABLE_MAX
+    _TABLE_CAP = cap
+    with JOBS_LOCK:
+        finished = sorted(
+            (job.finished_at, appid, job)
+            for appid, job in JOBS.items()
+            if job.finished_at is not None
+        )
+        surplus = len(JOBS) - cap
+    victims = []
+    for finished_at, appid, job in finished:
+        if now - finished_at >= ttl or len(victims) < surplus:
+            victims.append((appid, job))
+    evicted = sum(1 for appid, job in victims if evict_job(appid, job))
+    if evicted:
+        logger.log(f"Cyberia: Evicted {evicted} finished job(s) from the job table")
+    return evicted
+
+
+def changes_since(since_seq: int) -> Dict[str, Any]:
+    """Collect job deltas and tombstones newer than since_seq.
+
+    ``full`` is True when since_seq is 0, from a previous backend run, or
+    older than the retained tombstones; the client must then drop every job
+    it knows that is not in ``jobs``. Otherwise it removes the appids in
+    ``gone`` first and then merges ``jobs``.
+    """
+    prune_jobs()
+    with STATE_CHANGED:
+        current = _SEQ
+        full = since_seq <= 0 or since_seq > current or since_seq < _TOMBSTONE_FLOOR
+        if full:
+            since_seq = 0
+        gone = [appid for seq, appid in _TOMBSTONES if seq > since_seq]
+    with JOBS_LOCK:
+        jobs = list(JOBS.items())
+    records = {}
+    for appid, job in jobs:
+        record = job.delta(since_seq)
+        if record is not None:
+            records[str(appid)] = record
+    return {"seq": current, "full": full, "jobs": records, "gone": [] if full else gone}
+
+
+def wait_for_job(appid: int, since_seq: int, timeout: float) -> Optional[DownloadJob]:
+    """Return appid's job once its seq exceeds since_seq, or at the timeout.
+
+    A since_seq from before a backend restart (larger than anything issued
+    so far) is treated as 0 so the caller resynchronises immediately.
+    """
+    deadline = time.monotonic() + max(0.0, timeout)
+    with STATE_CHANGED:
+        if since_seq > _SEQ:
+            since_seq = 0
+        while True:
+            job = get_job(appid)
+            if job is not None and job.seq > since_seq:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            STATE_CHANGED.wait(remaining)
+
+
+__all__ = [
+    "DownloadJob",
+    "JOBS",
+    "JOBS_LOCK",
+    "SHORT_KEYS",
+    "STATE_CHANGED",
+    "changes_since",
+    "create_job",
+    "evict_job",
+    "get_job",
+    "prune_jobs",
+    "wait_for_job",
+]
@@ -5,11 +5,37 @@ import sys
 import webbrowser
 
 import Millennium  # type: ignore
-from config import WEB_UI_JS_FILE, WEBKIT_DIR_NAME
-from downloads import cancel_add_via_cyberia, get_add_status, start_add_via_cyberia
+from accela import refresh_accela
+from config import (
+    DOWNLOAD_SHUTDOWN_WAIT_SECONDS,
+    HISTORY_DEFAULT_LIMIT,
+    MILLENNIUM_STATUS_WAIT_MAX_SECONDS,
+    STATUS_WAIT_DEFAULT_SECONDS,
+    WEB_UI_JS_FILE,
+    WEBKIT_DIR_NAME,
+)
+from downloads import (
+    cancel_add_via_cyberia,
+    get_add_status,
+    get_all_statuses,
+    get_api_stats,
+    get_batch_status,
+    get_download_rate_limit,
+    get_history,
+    recover_jobs,
+    set_download_rate_limit,
+    start_add_batch,
+    start_add_via_cyberia,
+    stop_downloads,
+    wait_add_status,
+    wait_for_downloads,
+)
 from http_client import close_http_client
+from job_store import close_job_store
 from logger import logger as shared_logger
 from paths import get_plugin_dir, public_path
+from prewarm import start_prewarm
+from scheduler import PRIORITY_NORMAL
 from settings import load_settings, save_settings
 from slsonline import (
     check_fake_app_id,
@@ -66,18 +92,74 @@ def _inject_webkit_files() -> None:
     logger.log(f"Cyberia injected web UI: {js_path}")
 
 
-def StartAddViaCyberia(appid: int, contentScriptQuery: str = "") -> str:
-    return start_add_via_cyberia(appid)
+def StartAddViaCyberia(
+    appid: int,
+    contentScriptQuery: str = "",
+    priority: int = PRIORITY_NORMAL,
+    rate_limit=None,
+) -> str:
+    return start_add_via_cyberia(appid, priority, rate_limit)
+
+
+def StartAddBatch(
+    appids, contentScriptQuery: str = "", priority: int = PRIORITY_NORMAL
+) -> str:
+    return start_add_batch(appids, priority)
+
+
+def GetBatchStatus(batch_id: str, contentScriptQuery: str = "") -> str:
+    return get_batch_status(batch_id)
 
 
 def GetAddViaCyberiaStatus(appid: int, contentScriptQuery: str = "") -> str:
     return get_add_status(appid)
 
 
+def WaitAddViaCyberiaStatus(
+    appid: int,
+    contentScriptQuery: str = "",
+    since_seq: int = 0,
+    timeout: float = STATUS_WAIT_DEFAULT_SECONDS,
+) -> str:
+    try:
+        timeout = min(float(timeout), MILLENNIUM_STATUS_WAIT_MAX_SECONDS)
+    except (TypeError, ValueError):
+        pass
+    return wait_add_status(appid, since_seq, timeout)
+
+
+def GetAllStatuses(contentScriptQuery: str = "", since_seq: int = 0) -> str:
+    return get_all_statuses(since_seq)
+
+
+def GetHistory(
+    contentScriptQuery: str = "", limit: int = HISTORY_DEFAULT_LIMIT
+) -> str:
+    return get_history(limit)
+
+
 def CancelAddViaCyberia(appid: int, contentScriptQuery: str = "") -> str:
     return cancel_add_via_cyberia(appid)
 
 
+def GetApiStats(contentScriptQuery: str = "") -> str:
+    return get_api_stats()
+
+
+def GetDownloadRateLimit(contentScriptQuery: str = "") -> str:
+    return get_download_rate_limit()
+
+
+def SetDownloadRateLimit(
+    rate_bps, contentScriptQuery: str = "", burst_bytes=None, appid=None
+) -> str:
+    return set_download_rate_limit(rate_bps, burst_bytes, appid)
+
+
+def RefreshAccela(contentScriptQuery: str = "") -> str:
+    return refresh_accela()
+
+
 def OpenExternalUrl(url: str, contentScriptQuery: str = "") -> str:
     try:
         value = str(url or "").strip()
@@ -168,6 +250,14 @@ class Plugin:
         logger.log(f"bootstrapping Cyberia plugin, millennium {Millennium.version()}")
 
         ensure_temp_download_dir()
+        try:
+            recover_jobs()
+        except Exception as exc:
+            logger.error(f"Failed to recover interrupted jobs: {exc}")
+        try:
+            start_prewarm()
+        except Exception as exc:
+            logger.error(f"Failed to start connection warm-up: {exc}")
 
         _copy_webkit_files()
         _inject_webkit_files()
@@ -176,7 +266,11 @@ class Plugin:
 
     def _unload(self):
         logger.log("unloading")
+        stop_downloads()
         close_http_client("InitApis")
+        # Workers still record their final status; close the store after.
+        wait_for_downloads(DOWNLOAD_SHUTDOWN_WAIT_SECONDS)
+        close_job_store()
 
 
 plugin = Plugin()
@@ -0,0 +1,136 @@
+"""Persisted memory of APIs that answered 404 for an appid."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from config import (
+    NEGATIVE_CACHE_FILE,
+    NEGATIVE_CACHE_MAX_ENTRIES,
+    NEGATIVE_CACHE_TTL_SECONDS,
+)
+from logger import logger
+from paths import backend_path
+from settings import get_setting
+from utils import read_json
+
+
+def api_fingerprint(url_template: str, api_key: str) -> str:
+    """Identify an API configuration so edits to its URL or key reset its misses."""
+    raw = f"{url_template}\0{api_key}".encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def _entry_key(api_name: str, appid: int) -> str:
+    return f"{api_name}:{appid}"
+
+
+class NegativeCache:
+    """TTL'd set of (API name, appid) pairs known to be unavailable.
+
+    Each entry remembers the fingerprint of the API configuration that
+    produced the 404; a lookup with a different fingerprint (the URL or key
+    was changed in settings) ignores and drops the entry.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float) -> None:
+        self._path = path
+        self._ttl = max(0.0, float(ttl_seconds))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, object]] = {}
+        self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+
+    def is_unavailable(self, api_name: str, appid: int, fingerprint: str) -> bool:
+        if not self.enabled:
+            return False
+        key = _entry_key(api_name, appid)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if (
+                entry.get("fingerprint") == fingerprint
+                and float(entry.get("expires", 0)) > time.time()
+            ):
+                return True
+            del self._entries[key]
+            self._save_locked()
+            return False
+
+    def remember(self, api_name: str, appid: int, fingerprint: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[_entry_key(api_name, appid)] = {
+                "fingerprint": fingerprint,
+                "expires": time.time() + self._ttl,
+            }
+            self._prune_locked()
+            self._save_locked()
+
+    def _prune_locked(self) -> None:
+        now = time.time()
+        self._entries = {
+            key: entry
+            for key, entry in self._entries.items()
+            if float(entry.get("expires", 0)) > now
+        }
+        overflow = len(self._entries) - NEGATIVE_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            oldest = sorted(
+                self._entries, key=lambda key: self._entries[key].get("expires", 0)
+            )
+            for key in oldest[:overflow]:
+                del self._entries[key]
+
+    def _load(self) -> None:
+        data = read_json(self._path)
+        entries = data.get("entries") if isinstance(data, dict) else None
+        if isinstance(entries, dict):
+            self._entries = {
+                key: entry for key, entry in entries.items() if isinstance(entry, dict)
+            }
+        with self._lock:
+            self._prune_locked()
+
+    def _save_locked(self) -> None:
+        try:
+            tmp_path = self._path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump({"entries": self._entries}, handle)
+            os.replace(tmp_path, self._path)
+        except Exception as exc:
+            logger.warn(f"Cyberia: Failed to write negative cache: {exc}")
+
+
+_CACHE: Optional[NegativeCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_negative_cache() -> NegativeCache:
+    """Return the shared negative cache, creating it on first use."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                ttl = float(
+                    get_setting(
+                        "negative_cache_ttl_seconds", NEGATIVE_CACHE_TTL_SECONDS
+                    )
+                )
+            except Exception:
+                ttl = NEGATIVE_CACHE_TTL_SECONDS
+            _CACHE = NegativeCache(backend_path(NEGATIVE_CACHE_FILE), ttl)
+        return _CACHE
+
+
+__all__ = ["NegativeCache", "api_fingerprint", "get_negative_cache"]
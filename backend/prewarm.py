@@ -0,0 +1,149 @@
+"""Background warm-up of API hosts so the first download skips DNS and handshakes."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from api_manifest import load_api_manifest
+from config import (
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    PREWARM_ENABLED,
+    PREWARM_HOST_INTERVAL_SECONDS,
+    PREWARM_MAX_HOSTS,
+    PREWARM_MIN_INTERVAL_SECONDS,
+    USER_AGENT,
+)
+from http_client import ensure_http_client, get_dns_cache
+from logger import logger
+from settings import get_setting
+
+_LOCK = threading.Lock()
+_THREAD: Optional[threading.Thread] = None
+_LAST_RUN = 0.0
+# origin -> result of its last warm-up; warmedAt is a monotonic timestamp.
+_RESULTS: Dict[str, Dict[str, Any]] = {}
+
+
+def _origin(url: str) -> Optional[str]:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def api_origins(apis: List[Dict[str, Any]], limit: int) -> List[str]:
+    """Distinct scheme://host[:port] origins of the API url templates, in order."""
+    origins: List[str] = []
+    for api in apis:
+        origin = _origin(api.get("url", "").replace("<appid>", "0"))
+        if origin and origin not in origins:
+            origins.append(origin)
+    return origins[:limit]
+
+
+def _warm(client, origin: str) -> Dict[str, Any]:
+    parts = urlsplit(origin)
+    result: Dict[str, Any] = {"dnsMs": None, "headMs": None, "status": None}
+    started = time.monotonic()
+    try:
+        # Resolving through the shared cache keeps the answer for later probes.
+        get_dns_cache().resolve(parts.hostname)
+        result["dnsMs"] = round((time.monotonic() - started) * 1000.0, 1)
+        started = time.monotonic()
+        # Any answer, even a 404 or 405, leaves a connection in the pool.
+        resp = client.head(origin + "/", headers={"User-Agent": USER_AGENT})
+        result["headMs"] = round((time.monotonic() - started) * 1000.0, 1)
+        result["status"] = resp.status_code
+        result["ok"] = True
+    except Exception as exc:
+        result["ok"] = False
+        result["error"] = str(exc) or type(exc).__name__
+    result["warmedAt"] = time.monotonic()
+    return result
+
+
+def _run(origins: List[str], interval: float) -> None:
+    try:
+        client = ensure_http_client("Cyberia: prewarm")
+    except Exception as exc:
+        logger.warn(f"Cyberia: Connection warm-up skipped: {exc}")
+        return
+    for index, origin in enumerate(origins):
+        if index:
+            time.sleep(interval)
+        result = _warm(client, origin)
+        with _LOCK:
+            _RESULTS[origin] = result
+        if result["ok"]:
+            logger.log(
+                f"Cyberia: Warmed {origin} (dns {result['dnsMs']}ms, head {result['headMs']}ms)"
+            )
+        else:
+            logger.warn(f"Cyberia: Warm-up of {origin} failed: {result['error']}")
+
+
+def start_prewarm() -> bool:
+    """Start warming the enabled API hosts in the background.
+
+    Hosts are taken one at a time, PREWARM_HOST_INTERVAL_SECONDS apart and
+    at most PREWARM_MAX_HOSTS of them, and a new round starts at most every
+    PREWARM_MIN_INTERVAL_SECONDS. Returns True if a round was started.
+    """
+    global _THREAD, _LAST_RUN
+    if not get_setting("prewarm_connections", PREWARM_ENABLED):
+        return False
+    with _LOCK:
+        now = time.monotonic()
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        if _LAST_RUN and now - _LAST_RUN < PREWARM_MIN_INTERVAL_SECONDS:
+            return False
+        _LAST_RUN = now
+    try:
+        origins = api_origins(load_api_manifest(), PREWARM_MAX_HOSTS)
+    except Exception as exc:
+        logger.warn(f"Cyberia: Could not read APIs for warm-up: {exc}")
+        return False
+    if not origins:
+        return False
+    thread = threading.Thread(
+        target=_run,
+        args=(origins, PREWARM_HOST_INTERVAL_SECONDS),
+        name="cyberia-prewarm",
+        daemon=True,
+    )
+    with _LOCK:
+        _THREAD = thread
+    thread.start()
+    return True
+
+
+def is_warm(url: str) -> bool:
+    """True if url's host was warmed recently enough for its connection to be pooled."""
+    origin = _origin(url)
+    with _LOCK:
+        result = _RESULTS.get(origin) if origin else None
+    return bool(
+        result
+        and result["ok"]
+        and time.monotonic() - result["warmedAt"] < HTTP_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def prewarm_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Return the last warm-up result per origin, with its age in seconds."""
+    now = time.monotonic()
+    with _LOCK:
+        return {
+            origin: {
+                **{k: v for k, v in result.items() if k != "warmedAt"},
+                "ageSeconds": round(now - result["warmedAt"], 1),
+            }
+            for origin, result in _RESULTS.items()
+        }
+
+
+__all__ = ["api_origins", "is_warm", "prewarm_snapshot", "start_prewarm"]
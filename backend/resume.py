@@ -0,0 +1,75 @@
+"""Partial-download journaling so interrupted manifest downloads can resume."""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+from utils import read_json
+
+PART_SUFFIX = ".part"
+JOURNAL_SUFFIX = ".part.json"
+
+
+def part_path(dest_path: str) -> str:
+    return dest_path + PART_SUFFIX
+
+
+def journal_path(dest_path: str) -> str:
+    return dest_path + JOURNAL_SUFFIX
+
+
+def save_journal(dest_path: str, entry: Dict[str, Any]) -> None:
+    """Atomically write the sidecar describing the .part file next to dest_path."""
+    path = journal_path(dest_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(entry, handle)
+    os.replace(tmp_path, path)
+
+
+def load_resume_point(dest_path: str) -> Optional[Dict[str, Any]]:
+    """Return the journal entry for a resumable .part file, or None.
+
+    The entry is only usable when the .part file still exists and a validator
+    (ETag or Last-Modified) was recorded, since resuming without one could
+    splice two different versions of the archive together. ``bytes`` is set
+    to the size actually on disk, which may be ahead of the last journal write.
+    """
+    entry = read_json(journal_path(dest_path))
+    partial = part_path(dest_path)
+    if not entry or not os.path.exists(partial):
+        return None
+    if not (entry.get("etag") or entry.get("lastModified")):
+        return None
+    try:
+        size = os.path.getsize(partial)
+    except OSError:
+        return None
+    if size <= 0:
+        return None
+    entry["bytes"] = size
+    return entry
+
+
+def clear_partial(dest_path: str) -> None:
+    """Remove the .part file and its journal, ignoring missing files."""
+    for path in (part_path(dest_path), journal_path(dest_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            pass
+
+
+__all__ = [
+    "JOURNAL_SUFFIX",
+    "PART_SUFFIX",
+    "clear_partial",
+    "journal_path",
+    "load_resume_point",
+    "part_path",
+    "save_journal",
+]
@@ -0,0 +1,190 @@
+"""Bounded worker pool for Cyberia add/download jobs."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+from logger import logger
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+PRIORITY_LEVELS = (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+
+def normalize_priority(value) -> int:
+    """Clamp an RPC-supplied priority to one of the known levels."""
+    try:
+        priority = int(value)
+    except Exception:
+        return PRIORITY_NORMAL
+    return min(max(priority, PRIORITY_HIGH), PRIORITY_LOW)
+
+
+class DownloadScheduler:
+    """Fixed-size worker pool with per-priority FIFO queues.
+
+    Each appid is either queued or running at most once; submitting an appid
+    that is already known coalesces onto the existing job instead of starting
+    a second one, unless the caller asks for another run after the current
+    one, which is then queued as soon as that run returns. Workers are
+    started lazily and stay parked on the condition variable while the queue
+    is empty.
+    """
+
+    def __init__(
+        self, worker: Callable[[int], None], max_workers: int, name: str = "cyberia-dl"
+    ) -> None:
+        self._worker = worker
+        self._max_workers = max(1, int(max_workers))
+        self._name = name
+        self._cond = threading.Condition()
+        self._queues: Dict[int, Deque[int]] = {p: deque() for p in PRIORITY_LEVELS}
+        self._queued: Dict[int, int] = {}
+        self._running: Set[int] = set()
+        self._deferred: Dict[int, int] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def submit(
+        self, appid: int, priority: int = PRIORITY_NORMAL, rerun: bool = False
+    ) -> bool:
+        """Queue appid for processing.
+
+        Returns False when the appid was already queued or running and the
+        submission was coalesced onto that job. A coalesced submission with a
+        higher priority than the queued one moves the job up. With rerun, an
+        appid that is still running is queued again once its run returns.
+        """
+        priority = normalize_priority(priority)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Download scheduler is shut down")
+            if appid in self._running:
+                current = self._deferred.get(appid)
+                if current is not None:
+                    self._deferred[appid] = min(current, priority)
+                    return False
+                if rerun:
+                    self._deferred[appid] = priority
+                    return True
+                return False
+            current = self._queued.get(appid)
+            if current is not None:
+                if priority < current:
+                    self._queues[current].remove(appid)
+                    self._queues[priority].append(appid)
+                    self._queued[appid] = priority
+                return False
+
+            self._queues[priority].append(appid)
+            self._queued[appid] = priority
+            self._spawn_worker_locked()
+            self._cond.notify()
+            return True
+
+    def discard(self, appid: int) -> bool:
+        """Drop a queued (not yet running) appid. Returns True if it was removed."""
+        with self._cond:
+            if self._deferred.pop(appid, None) is not None:
+                return True
+            priority = self._queued.pop(appid, None)
+            if priority is None:
+                return False
+            self._queues[priority].remove(appid)
+            return True
+
+    def is_active(self, appid: int) -> bool:
+        with self._cond:
+            return appid in self._running or appid in self._queued
+
+    def is_running(self, appid: int) -> bool:
+        with self._cond:
+            return appid in self._running
+
+    def position(self, appid: int) -> Optional[int]:
+        """Return the 1-based queue position of appid, or None if not queued."""
+        with self._cond:
+            priority = self._queued.get(appid)
+            if priority is None:
+                return None
+            ahead = sum(len(self._queues[p]) for p in PRIORITY_LEVELS if p < priority)
+            return ahead + self._queues[priority].index(appid) + 1
+
+    def shutdown(self) -> None:
+        """Drop queued work and let idle workers exit. Running jobs finish."""
+        with self._cond:
+            self._stopped = True
+            for queue in self._queues.values():
+                queue.clear()
+            self._queued.clear()
+            self._deferred.clear()
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> int:
+        """Wait until no job is running; return how many still are."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return len(self._running)
+
+    def _spawn_worker_locked(self) -> None:
+        self._threads = [t for t in self._threads if t.is_alive()]
+        if len(self._threads) >= self._max_workers:
+            return
+        # Workers not busy with a job will pick up queued items on their own.
+        if len(self._threads) - len(self._running) >= len(self._queued):
+            return
+        thread = threading.Thread(
+            target=self._run,
+            name=f"{self._name}-{len(self._threads) + 1}",
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _next_locked(self) -> Optional[int]:
+        for priority in PRIORITY_LEVELS:
+            queue = self._queues[priority]
+            if queue:
+                appid = queue.popleft()
+                del self._queued[appid]
+                return appid
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                appid = self._next_locked()
+                while appid is None:
+                    if self._stopped:
+                        return
+                    self._cond.wait()
+                    appid = self._next_locked()
+                self._running.add(appid)
+
+            try:
+                self._worker(appid)
+            except Exception as exc:
+                logger.warn(f"Cyberia: Download worker failed for appid={appid}: {exc}")
+            finally:
+                with self._cond:
+                    self._running.discard(appid)
+                    priority = self._deferred.pop(appid, None)
+                    if priority is not None and not self._stopped:
+                        self._queues[priority].append(appid)
+                        self._queued[appid] = priority
+                    # Wakes idle workers and wait_idle() callers alike.
+                    self._cond.notify_all()
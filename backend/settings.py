@@ -126,6 +126,15 @@ def load_settings() -> Dict[str, Any]:
         return settings
 
 
+def get_setting(key: str, default: Any = None) -> Any:
+    """Returns a single value from settings.json without migrating or logging."""
+    settings = read_json(backend_path(SETTINGS_JSON_FILE))
+    if not isinstance(settings, dict):
+        return default
+    value = settings.get(key)
+    return default if value is None else value
+
+
 def save_settings(settings: Dict[str, Any]) -> bool:
     """Saves settings to settings.json."""
     settings_path = backend_path(SETTINGS_JSON_FILE)
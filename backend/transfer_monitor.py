@@ -0,0 +1,245 @@
+"""Live speed/ETA estimates and stall detection for streaming downloads."""
+
+from __future__ import annotations
+
+import contextlib
+import math
+import socket
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from logger import logger
+
+
+class DownloadStalled(OSError):
+    """Raised when a stream delivered no bytes for the stall interval."""
+
+    error_class = "stalled"
+
+
+class TransferMeter:
+    """Rolling bytes-per-second estimate and the ETA derived from it.
+
+    Samples are weighted by the time they cover, so the estimate settles
+    within roughly ``window`` seconds whether chunks arrive every few
+    milliseconds or every few seconds.
+    """
+
+    def __init__(self, start_bytes: int, window: float) -> None:
+        self._window = max(0.1, float(window))
+        self._last_bytes = start_bytes
+        self._last_time = time.monotonic()
+        self.speed: Optional[float] = None
+
+    def sample(self, total_read: int) -> Optional[float]:
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if elapsed <= 0:
+            return self.speed
+        rate = (total_read - self._last_bytes) / elapsed
+        if self.speed is None:
+            self.speed = rate
+        else:
+            alpha = 1.0 - math.exp(-elapsed / self._window)
+            self.speed = alpha * rate + (1.0 - alpha) * self.speed
+        self._last_bytes = total_read
+        self._last_time = now
+        return self.speed
+
+    def eta(self, total_read: int, total_bytes: int) -> Optional[float]:
+        if not total_bytes or not self.speed or self.speed <= 0:
+            return None
+        return max(0.0, (total_bytes - total_read) / self.speed)
+
+    def fields(self, total_read: int, total_bytes: int) -> dict:
+        """Job fields for the current estimate."""
+        speed = self.sample(total_read)
+        eta = self.eta(total_read, total_bytes)
+        return {
+            "speedBps": int(speed) if speed is not None else None,
+            "etaSeconds": round(eta, 1) if eta is not None else None,
+        }
+
+
+def _shutdown_network_stream(stream) -> bool:
+    """Shut down the socket behind an httpcore network stream, if it has one."""
+    sock = None
+    if stream is not None:
+        try:
+            sock = stream.get_extra_info("socket")
+        except Exception:
+            sock = None
+    if sock is None:
+        return False
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+        return True
+    except OSError:
+        return False
+
+
+def abort_stream(resp) -> None:
+    """Wake a thread blocked reading resp by shutting its socket down."""
+    stream = (getattr(resp, "extensions", None) or {}).get("network_stream")
+    if _shutdown_network_stream(stream):
+        return
+    try:
+        resp.close()
+    except Exception:
+        pass
+
+
+class RequestAborter:
+    """Cut off one request from another thread, before or after its headers.
+
+    Pass ``trace`` as the request's "trace" extension so the connection is
+    known while the request still waits for an answer, and hand the response
+    to ``attach()`` once it arrives. ``abort()`` then shuts the socket down,
+    which fails the blocked call straight away; after ``finish()`` it does
+    nothing. HTTP/2 connections are shared with other requests, so there the
+    response is only closed, and a request still waiting for its headers
+    runs into its timeout as before.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stream = None
+        self._resp = None
+        self._http2 = False
+        self._finished = False
+        self.aborted = False
+
+    def trace(self, event: str, info: dict) -> None:
+        if event.startswith("http2."):
+            self._http2 = True
+        elif event in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            with self._lock:
+                # A new connection means a new attempt; its response is not in yet.
+                self._stream = info.get("return_value")
+                self._resp = None
+                aborted = self.aborted
+            if aborted:
+                # A retry opened a new connection after the abort.
+                self._cut()
+
+    def attach(self, resp) -> None:
+        with self._lock:
+            self._resp = resp
+            aborted = self.aborted
+        if aborted:
+            self._cut()
+
+    def finish(self) -> None:
+        with self._lock:
+            self._finished = True
+
+    def abort(self) -> None:
+        with self._lock:
+            if self._finished or self.aborted:
+                return
+            self.aborted = True
+        self._cut()
+
+    def _cut(self) -> None:
+        with self._lock:
+            resp, stream = self._resp, self._stream
+        if resp is not None:
+            if self._http2:
+                try:
+                    resp.close()
+                except Exception:
+                    pass
+            else:
+                abort_stream(resp)
+        elif not self._http2:
+            _shutdown_network_stream(stream)
+
+
+class StallWatchdog:
+    """Watch a byte counter from a side thread and report when it stops moving.
+
+    ``read_bytes()`` is polled a few times per ``interval``; once it has not
+    changed for ``interval`` seconds ``on_stall()`` is called, and
+    ``on_resume()`` when bytes flow again. With ``abort`` set the stream is
+    shut down on the first stall so the blocked reader fails straight away
+    instead of waiting for the HTTP read timeout. Time spent inside
+    ``hold()`` (e.g. waiting for the bandwidth limiter) never counts.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        read_bytes: Callable[[], int],
+        interval: float,
+        on_stall: Callable[[], None],
+        on_resume: Callable[[], None],
+        abort: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self._read_bytes = read_bytes
+        self._interval = float(interval)
+        self._on_stall = on_stall
+        self._on_resume = on_resume
+        self._abort = abort
+        self._stop = threading.Event()
+        self._held = 0
+        self.stalled = False
+        self.aborted = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def __enter__(self) -> "StallWatchdog":
+        if self._interval > 0:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    @contextlib.contextmanager
+    def hold(self) -> Iterator[None]:
+        """Suspend stall detection while the reader is idle on purpose."""
+        self._held += 1
+        try:
+            yield
+        finally:
+            self._held -= 1
+
+    def _run(self) -> None:
+        tick = min(1.0, self._interval / 4)
+        last = self._read_bytes()
+        moved_at = time.monotonic()
+        while not self._stop.wait(tick):
+            current = self._read_bytes()
+            now = time.monotonic()
+            if self._held:
+                moved_at = now
+                continue
+            if current != last:
+                last = current
+                moved_at = now
+                if self.stalled:
+                    self.stalled = False
+                    self._notify(self._on_resume)
+                continue
+            if self.stalled or now - moved_at < self._interval:
+                continue
+            self.stalled = True
+            self._notify(self._on_stall)
+            if self._abort is not None:
+                self.aborted = True
+                self._notify(self._abort)
+                return
+
+    def _notify(self, callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception as exc:
+            logger.warn(f"Cyberia: Stall watchdog callback failed: {exc}")
+
+
+__all__ = ["DownloadStalled", "StallWatchdog", "TransferMeter", "abort_stream"]
@@ -65,6 +65,20 @@ def ensure_temp_download_dir() -> str:
     return root
 
 
+def ensure_spool_dir() -> str:
+    """Return a RAM-backed directory for short-lived zips, else temp_dl."""
+    shm = "/dev/shm"
+    if os.path.isdir(shm):
+        root = os.path.join(shm, "cyberia")
+        try:
+            os.makedirs(root, exist_ok=True)
+            if os.access(root, os.W_OK):
+                return root
+        except Exception:
+            pass
+    return ensure_temp_download_dir()
+
+
 def get_accela_api_key() -> str:
     """
     Attempts to read the Morrenus API key from ACCELA's QSettings.
@@ -105,6 +119,7 @@ def get_accela_api_key() -> str:
 
 
 __all__ = [
+    "ensure_spool_dir",
     "ensure_temp_download_dir",
     "get_accela_api_key",
     "normalize_manifest_text",
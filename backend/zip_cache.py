@@ -0,0 +1,199 @@
+"""On-disk cache of downloaded manifest zips, revalidated with HTTP validators."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Optional, Union
+
+from config import MANIFEST_CACHE_DIR_NAME, MANIFEST_CACHE_MAX_BYTES
+from logger import logger
+from paths import backend_path
+from settings import get_setting
+from utils import read_json
+
+INDEX_FILE = "index.json"
+
+
+def _entry_key(appid: int, api_name: str) -> str:
+    return f"{appid}:{api_name}"
+
+
+class ManifestCache:
+    """LRU cache of manifest zips keyed by (appid, API name).
+
+    Only responses that carry an ETag or Last-Modified are stored, so every
+    hit can be revalidated with a conditional request; a 304 then reuses the
+    cached bytes without transferring the body again. The index is a small
+    JSON file next to the cached zips and is rewritten on every change.
+    """
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self._root = root
+        self._max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes > 0
+
+    def lookup(self, appid: int, api_name: str, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cache entry for appid/API if its zip is still on disk."""
+        if not self.enabled:
+            return None
+        key = _entry_key(appid, api_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self._root, entry["file"])
+            if entry.get("url") != url or not os.path.exists(path):
+                self._drop_locked(key)
+                self._save_index_locked()
+                return None
+            return dict(entry)
+
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("lastModified"):
+            headers["If-Modified-Since"] = entry["lastModified"]
+        return headers
+
+    def materialize(self, entry: Dict[str, Any], dest_path: str) -> None:
+        """Copy a cached zip to dest_path and mark it most recently used."""
+        key = _entry_key(entry["appid"], entry["api"])
+        src = os.path.join(self._root, entry["file"])
+        tmp_path = dest_path + ".tmp"
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dest_path)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None:
+                current["lastUsed"] = time.time()
+                self._save_index_locked()
+
+    def store(
+        self,
+        appid: int,
+        api_name: str,
+        url: str,
+        source: Union[str, bytes],
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> bool:
+        """Copy a freshly downloaded zip into the cache. Returns True if stored.
+
+        source is either the path of the zip or its bytes when the body was
+        spooled in memory.
+        """
+        if not self.enabled or not (etag or last_modified):
+            return False
+        in_memory = isinstance(source, (bytes, bytearray))
+        size = len(source) if in_memory else os.path.getsize(source)
+        if size > self._max_bytes:
+            return False
+
+        key = _entry_key(appid, api_name)
+        digest = hashlib.sha1(api_name.encode("utf-8")).hexdigest()[:10]
+        filename = f"{appid}-{digest}.zip"
+        os.makedirs(self._root, exist_ok=True)
+        target = os.path.join(self._root, filename)
+        tmp_path = target + ".tmp"
+        if in_memory:
+            with open(tmp_path, "wb") as handle:
+                handle.write(source)
+        else:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {
+                "appid": appid,
+                "api": api_name,
+                "url": url,
+                "file": filename,
+                "size": size,
+                "etag": etag,
+                "lastModified": last_modified,
+                "storedAt": now,
+                "lastUsed": now,
+            }
+            self._evict_locked()
+            self._save_index_locked()
+        return True
+
+    def _evict_locked(self) -> None:
+        total = sum(int(e.get("size", 0)) for e in self._entries.values())
+        if total <= self._max_bytes:
+            return
+        for key, entry in sorted(
+            self._entries.items(), key=lambda item: item[1].get("lastUsed", 0)
+        ):
+            if total <= self._max_bytes:
+                break
+            total -= int(entry.get("size", 0))
+            logger.log(f"Cyberia: Evicting cached manifest {key}")
+            self._drop_locked(key)
+
+    def _drop_locked(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        try:
+            os.remove(os.path.join(self._root, entry["file"]))
+        except Exception:
+            pass
+
+    def _load_index(self) -> None:
+        data = read_json(os.path.join(self._root, INDEX_FILE))
+        entries = data.get("entries") if isinstance(data, dict) else None
+        if isinstance(entries, dict):
+            self._entries = {
+                key: entry
+                for key, entry in entries.items()
+                if isinstance(entry, dict) and entry.get("file")
+            }
+        with self._lock:
+            self._evict_locked()
+
+    def _save_index_locked(self) -> None:
+        try:
+            os.makedirs(self._root, exist_ok=True)
+            path = os.path.join(self._root, INDEX_FILE)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump({"entries": self._entries}, handle)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            logger.warn(f"Cyberia: Failed to write manifest cache index: {exc}")
+
+
+_CACHE: Optional[ManifestCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_manifest_cache() -> ManifestCache:
+    """Return the shared manifest cache, creating it on first use."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                max_bytes = int(
+                    get_setting("manifest_cache_bytes", MANIFEST_CACHE_MAX_BYTES)
+                )
+            except Exception:
+                max_bytes = MANIFEST_CACHE_MAX_BYTES
+            _CACHE = ManifestCache(backend_path(MANIFEST_CACHE_DIR_NAME), max_bytes)
+        return _CACHE
+
+
+__all__ = ["ManifestCache", "get_manifest_cache"]
@@ -0,0 +1,267 @@
+"""Incremental zip validation for archives that are still being downloaded."""
+
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import Optional
+
+LOCAL_SIG = b"PK\x03\x04"
+CENTRAL_SIG = b"PK\x01\x02"
+ZIP64_EOCD_SIG = b"PK\x06\x06"
+EOCD_SIG = b"PK\x05\x06"
+DESCRIPTOR_SIG = b"PK\x07\x08"
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_EOCD = struct.Struct("<4sHHHHIIH")
+# The EOCD record is 22 bytes followed by a comment of at most 65535 bytes.
+_TAIL_BYTES = _EOCD.size + 0xFFFF
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DESCRIPTOR = 0x08
+_STORED = 0
+_DEFLATED = 8
+
+
+class ZipValidationError(ValueError):
+    """Raised when the bytes seen so far cannot belong to a valid zip."""
+
+    error_class = "corrupt_zip"
+
+
+class StreamingZipValidator:
+    """Check a zip archive chunk by chunk as it is written to disk.
+
+    Local file headers are parsed in order; stored and deflated members are
+    decompressed on the fly and their CRC-32 compared with the header (or
+    the data descriptor). Members that cannot be checked incrementally
+    (encrypted, other compression methods) are skipped by size. A stored
+    member with a data descriptor has no discoverable end, so member-level
+    checks stop there and only the end-of-central-directory check remains.
+    ``finish()`` verifies that the archive ends with an EOCD record whose
+    central directory offset and entry count match what was streamed.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._tail = bytearray()
+        self._size = 0
+        self._consumed = 0
+        self._state = "header"
+        self._entry: Optional[dict] = None
+        self._entries = 0
+        self._central_offset: Optional[int] = None
+        self.unverified = 0
+
+    @property
+    def entries(self) -> int:
+        return self._entries
+
+    def feed(self, data: bytes) -> None:
+        self._size += len(data)
+        self._tail += data
+        if len(self._tail) > _TAIL_BYTES:
+            del self._tail[: len(self._tail) - _TAIL_BYTES]
+        if self._state in ("central", "opaque"):
+            return
+        self._buf += data
+        self._parse()
+
+    def finish(self) -> None:
+        """Validate the archive trailer once the last byte has been fed."""
+        if self._state in ("header", "data", "descriptor"):
+            raise ZipValidationError(
+                f"archive truncated inside member {self._entries + 1}"
+            )
+
+        tail = bytes(self._tail)
+        index = tail.rfind(EOCD_SIG)
+        if index < 0 or len(tail) - index < _EOCD.size:
+            raise ZipValidationError("end of central directory record not found")
+        _, _, _, _, total, cd_size, cd_offset, comment_len = _EOCD.unpack_from(
+            tail, index
+        )
+        eocd_offset = self._size - (len(tail) - index)
+        if index + _EOCD.size + comment_len > len(tail):
+            raise ZipValidationError("end of central directory comment truncated")
+        if cd_offset == 0xFFFFFFFF or total == 0xFFFF:
+            # Zip64 archives keep the real values in the zip64 EOCD record.
+            return
+        if cd_offset + cd_size > eocd_offset:
+            raise ZipValidationError("central directory overlaps its trailer")
+        if self._central_offset is not None and self._central_offset != cd_offset:
+            raise ZipValidationError(
+                f"central directory at {self._central_offset}, trailer says {cd_offset}"
+            )
+        if self._state == "central" and total != self._entries:
+            raise ZipValidationError(
+                f"trailer lists {total} entries, archive contains {self._entries}"
+            )
+
+    def _take(self, count: int) -> bytes:
+        chunk = bytes(self._buf[:count])
+        del self._buf[:count]
+        self._consumed += len(chunk)
+        return chunk
+
+    def _parse(self) -> None:
+        while True:
+            if self._state == "header":
+                if not self._parse_header():
+                    return
+            elif self._state == "data":
+                if not self._parse_data():
+                    return
+            elif self._state == "descriptor":
+                if not self._parse_descriptor():
+                    return
+            else:
+                self._buf.clear()
+                return
+
+    def _parse_header(self) -> bool:
+        if len(self._buf) < 4:
+            return False
+        signature = bytes(self._buf[:4])
+        if signature in (CENTRAL_SIG, ZIP64_EOCD_SIG, EOCD_SIG):
+            self._central_offset = self._consumed
+            self._state = "central"
+            return True
+        if signature != LOCAL_SIG:
+            raise ZipValidationError(
+                f"bad signature {signature.hex()} at offset {self._consumed}"
+            )
+        if len(self._buf) < _LOCAL_HEADER.size:
+            return False
+        _, _, flags, method, _, _, crc, csize, usize, name_len, extra_len = (
+            _LOCAL_HEADER.unpack_from(self._buf)
+        )
+        header_len = _LOCAL_HEADER.size + name_len + extra_len
+        if len(self._buf) < header_len:
+            return False
+        extra = bytes(self._buf[_LOCAL_HEADER.size + name_len : header_len])
+        self._take(header_len)
+
+        zip64 = csize == 0xFFFFFFFF or usize == 0xFFFFFFFF
+        if zip64:
+            usize, csize = _zip64_sizes(extra, usize, csize)
+
+        descriptor = bool(flags & _FLAG_DESCRIPTOR)
+        verify = method in (_STORED, _DEFLATED) and not flags & _FLAG_ENCRYPTED
+        if descriptor and not (verify and method == _DEFLATED):
+            # Nothing tells us where this member ends without the central
+            # directory; leave the rest to the trailer check.
+            self.unverified += 1
+            self._state = "opaque"
+            return True
+        if not verify:
+            self.unverified += 1
+
+        self._entry = {
+            "method": method,
+            "crc": crc,
+            "usize": usize,
+            "remaining": csize,
+            "descriptor": descriptor,
+            "zip64": zip64,
+            "verify": verify,
+            "actual_crc": 0,
+            "actual_size": 0,
+            "inflater": zlib.decompressobj(-15) if method == _DEFLATED else None,
+        }
+        self._state = "data"
+        return True
+
+    def _inflate(self, entry: dict, chunk: bytes) -> None:
+        if entry["inflater"] is not None:
+            try:
+                chunk = entry["inflater"].decompress(chunk)
+            except zlib.error as exc:
+                raise ZipValidationError(f"corrupt deflate stream: {exc}") from exc
+        entry["actual_crc"] = zlib.crc32(chunk, entry["actual_crc"])
+        entry["actual_size"] += len(chunk)
+
+    def _parse_data(self) -> bool:
+        entry = self._entry
+        if entry["descriptor"]:
+            # Deflated member of unknown size: the deflate stream marks its end.
+            chunk = bytes(self._buf)
+            self._buf.clear()
+            self._inflate(entry, chunk)
+            inflater = entry["inflater"]
+            if not inflater.eof:
+                self._consumed += len(chunk)
+                return False
+            unused = inflater.unused_data
+            self._consumed += len(chunk) - len(unused)
+            self._buf[:0] = unused
+            self._state = "descriptor"
+            return True
+
+        if not self._buf and entry["remaining"] > 0:
+            return False
+        chunk = self._take(min(len(self._buf), entry["remaining"]))
+        entry["remaining"] -= len(chunk)
+        if entry["verify"]:
+            self._inflate(entry, chunk)
+        if entry["remaining"] > 0:
+            return False
+        if entry["verify"]:
+            self._check_member(entry["crc"], entry["usize"])
+        self._entries += 1
+        self._state = "header"
+        return True
+
+    def _parse_descriptor(self) -> bool:
+        entry = self._entry
+        size_len = 8 if entry["zip64"] else 4
+        has_sig = bytes(self._buf[:4]) == DESCRIPTOR_SIG
+        needed = (4 if has_sig else 0) + 4 + 2 * size_len
+        if len(self._buf) < max(needed, 4):
+            return False
+        record = self._take(needed)
+        if has_sig:
+            record = record[4:]
+        (crc,) = struct.unpack_from("<I", record)
+        fmt = "<Q" if entry["zip64"] else "<I"
+        (usize,) = struct.unpack_from(fmt, record, 4 + size_len)
+        self._check_member(crc, usize)
+        self._entries += 1
+        self._state = "header"
+        return True
+
+    def _check_member(self, crc: int, usize: int) -> None:
+        entry = self._entry
+        if entry["inflater"] is not None and not entry["inflater"].eof:
+            raise ZipValidationError(
+                f"member {self._entries + 1} deflate stream cut short"
+            )
+        if entry["actual_crc"] != crc:
+            raise ZipValidationError(
+                f"member {self._entries + 1} CRC mismatch ({entry['actual_crc']:08x} != {crc:08x})"
+            )
+        if entry["actual_size"] != usize:
+            raise ZipValidationError(
+                f"member {self._entries + 1} size mismatch ({entry['actual_size']} != {usize})"
+            )
+
+
+def _zip64_sizes(extra: bytes, usize: int, csize: int):
+    """Read the real sizes from a zip64 extended information extra field."""
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<HH", extra, offset)
+        body = extra[offset + 4 : offset + 4 + length]
+        if header_id == 0x0001:
+            position = 0
+            if usize == 0xFFFFFFFF and position + 8 <= len(body):
+                (usize,) = struct.unpack_from("<Q", body, position)
+                position += 8
+            if csize == 0xFFFFFFFF and position + 8 <= len(body):
+                (csize,) = struct.unpack_from("<Q", body, position)
+            break
+        offset += 4 + length
+    return usize, csize
+
+
+__all__ = ["StreamingZipValidator", "ZipValidationError"]
@@ -0,0 +1,408 @@
+"""End-to-end benchmark: the download pipeline against a local mock API.
+
+Starts an HTTP stand-in that serves generated manifest zips, points a
+scratch copy of the backend at it (settings.json api_list, plus a fake
+ACCELA that exits straight away) and fires rounds of concurrent
+start_add_via_cyberia calls, following each job with wait_add_status the
+way the frontends do. Every concurrency level runs in a fresh process
+with its own backend directory, so caches, stats and the job store start
+empty and the real settings.json is never touched; one untimed job warms
+each process up before the clock starts.
+
+The mock decides per (api, appid) pair, from --seed, whether to answer
+404, a non-zip 200 or the zip, and whether to drip the body slowly, so
+runs with the same flags hit the same mix. The report gives p50/p95
+time-to-done, throughput and CPU per job for each level as JSON. The
+fake ACCELA is a shell script, so this runs on Linux and macOS only.
+
+With --retry-check every job that failed is added once more after the
+timed rounds, and the mock counts (api, appid) pairs it answered 404 more
+than once. The negative cache should keep that at zero; the run exits
+non-zero otherwise.
+
+Usage: python benchmarks/bench_downloads.py [--levels 1,4,16] [--rounds N]
+       [--size BYTES] [--latency-ms MS] [--not-found-ratio R]
+       [--html-ratio R] [--drip-ratio R] [--apis N] [--retry-check]
+       [--output FILE]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Far above real Steam appids so spool files never collide with a real job.
+APPID_BASE = 900_000_000
+TERMINAL = ("done", "failed", "cancelled")
+
+
+class MockApi:
+    """What the stand-in server serves; one instance shared by its handlers."""
+
+    def __init__(self, args) -> None:
+        self.seed = args.seed
+        self.latency = args.latency_ms / 1000.0
+        self.not_found_ratio = args.not_found_ratio
+        self.html_ratio = args.html_ratio
+        self.drip_ratio = args.drip_ratio
+        self.drip_chunks = max(1, args.drip_chunks)
+        self.drip_delay = args.drip_ms / 1000.0
+        self.zip_body = _build_zip(args.size, args.seed)
+        self.html_body = b"<html><body>Rate limited, try again later</body></html>"
+        self.not_found_lock = threading.Lock()
+        self.not_found_hits: dict = {}
+
+    def count_not_found(self, api: int, appid: int) -> None:
+        with self.not_found_lock:
+            key = (api, appid)
+            self.not_found_hits[key] = self.not_found_hits.get(key, 0) + 1
+
+    def repeated_not_found(self) -> int:
+        """Return how many (api, appid) pairs were answered 404 more than once."""
+        with self.not_found_lock:
+            return sum(1 for hits in self.not_found_hits.values() if hits > 1)
+
+    def reset_counts(self) -> None:
+        with self.not_found_lock:
+            self.not_found_hits.clear()
+
+    def plan(self, api: int, appid: int):
+        """Return (kind, drip) for one request, stable for a given seed."""
+        rng = random.Random(f"{self.seed}:{api}:{appid}")
+        roll = rng.random()
+        if roll < self.not_found_ratio:
+            kind = "missing"
+        elif roll < self.not_found_ratio + self.html_ratio:
+            kind = "html"
+        else:
+            kind = "zip"
+        return kind, rng.random() < self.drip_ratio
+
+
+def _build_zip(size: int, seed: int) -> bytes:
+    # Stored random bytes keep the body at the requested size.
+    payload = random.Random(seed).randbytes(max(0, size))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("manifest.lua", payload)
+    return buf.getvalue()
+
+
+def _make_handler(mock: MockApi):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_HEAD(self) -> None:
+            self._reply(404, b"", head=True)
+
+        def do_GET(self) -> None:
+            try:
+                _, api, appid = self.path.split("/")
+                kind, drip = mock.plan(int(api), int(appid))
+            except ValueError:
+                self._reply(400, b"")
+                return
+            if mock.latency:
+                time.sleep(mock.latency)
+            if kind == "missing":
+                mock.count_not_found(int(api), int(appid))
+                self._reply(404, b"")
+            elif kind == "html":
+                self._reply(200, mock.html_body, content_type="text/html")
+            else:
+                self._reply(
+                    200, mock.zip_body, content_type="application/zip", drip=drip
+                )
+
+        def _reply(self, status, body, content_type=None, drip=False, head=False):
+            self.send_response(status)
+            if content_type:
+                self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if head or not body:
+                return
+            if not drip:
+                self.wfile.write(body)
+                return
+            step = -(-len(body) // mock.drip_chunks)
+            for offset in range(0, len(body), step):
+                self.wfile.write(body[offset : offset + step])
+                self.wfile.flush()
+                time.sleep(mock.drip_delay)
+
+    return Handler
+
+
+class _MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # The backend hangs up on the losers of an API race; that is expected.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _start_server(mock: MockApi) -> ThreadingHTTPServer:
+    server = _MockServer(("127.0.0.1", 0), _make_handler(mock))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _prepare_backend(workdir: str, port: int, args) -> str:
+    """Copy the backend into workdir and point its settings at the mock."""
+    backend = os.path.join(workdir, "backend")
+    os.makedirs(backend)
+    for name in os.listdir(BACKEND_DIR):
+        if name.endswith(".py") or name == "settings.template.json":
+            shutil.copy2(os.path.join(BACKEND_DIR, name), backend)
+
+    accela = os.path.join(workdir, "accela.sh")
+    with open(accela, "w", encoding="utf-8") as handle:
+        handle.write("#!/bin/sh\nexit 0\n")
+    os.chmod(accela, 0o755)
+
+    settings = {
+        "version": 1,
+        "api_list": [
+            {
+                "name": f"Mock {index}",
+                "url": f"http://127.0.0.1:{port}/{index}/<appid>",
+                "enabled": True,
+            }
+            for index in range(args.apis)
+        ],
+        "accela_location": accela,
+        "prewarm_connections": False,
+    }
+    if args.workers:
+        settings["max_concurrent_downloads"] = args.workers
+    with open(os.path.join(backend, "settings.json"), "w", encoding="utf-8") as handle:
+        json.dump(settings, handle, indent=2)
+    return backend
+
+
+def _percentile(values, pct: float):
+    """Nearest-rank percentile of values, or None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _cpu_seconds(who) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _follow(downloads, appid: int, barrier: threading.Barrier, results: list) -> None:
+    barrier.wait()
+    started = time.perf_counter()
+    reply = json.loads(downloads.start_add_via_cyberia(appid))
+    state = {"status": "failed", "error": reply.get("error")}
+    seq = 0
+    while reply.get("success"):
+        status = json.loads(downloads.wait_add_status(appid, seq, 10))
+        seq, state = status["seq"], status["state"]
+        if state.get("status") in TERMINAL:
+            break
+    results.append(
+        {
+            "appid": appid,
+            "seconds": time.perf_counter() - started,
+            "status": state.get("status"),
+            "bytes": int(state.get("bytesRead") or 0),
+            "errorClass": state.get("errorClass"),
+        }
+    )
+
+
+def _run_level(config: dict) -> dict:
+    """Body of the child process: drive one concurrency level and measure it."""
+    sys.path.insert(0, config["backend"])
+    if importlib.util.find_spec("PluginUtils") is None:
+        # Outside Steam there is no host logger; keep the backend quiet.
+        shim = types.ModuleType("PluginUtils")
+        shim.Logger = type(
+            "Logger", (), {"log": _ignore, "warn": _ignore, "error": _ignore}
+        )
+        sys.modules["PluginUtils"] = shim
+
+    import downloads  # noqa: E402
+
+    concurrency = config["concurrency"]
+    # One untimed job first, so ACCELA lookup and other one-off start-up
+    # work do not land on the first measured round.
+    _follow(downloads, config["appid_base"] - 1, threading.Barrier(1), [])
+
+    results: list = []
+    cpu_start = _cpu_seconds(resource.RUSAGE_SELF)
+    children_start = _cpu_seconds(resource.RUSAGE_CHILDREN)
+    wall_start = time.perf_counter()
+    appid = config["appid_base"]
+    for _ in range(config["rounds"]):
+        barrier = threading.Barrier(concurrency)
+        threads = []
+        for _ in range(concurrency):
+            thread = threading.Thread(
+                target=_follow, args=(downloads, appid, barrier, results)
+            )
+            thread.start()
+            threads.append(thread)
+            appid += 1
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - wall_start
+    cpu = _cpu_seconds(resource.RUSAGE_SELF) - cpu_start
+    accela_cpu = _cpu_seconds(resource.RUSAGE_CHILDREN) - children_start
+
+    retried = [r["appid"] for r in results if r["status"] != "done"]
+    if config["retry_check"]:
+        # Untimed: the second attempt should not ask the APIs that said 404.
+        for failed_appid in retried:
+            _follow(downloads, failed_appid, threading.Barrier(1), [])
+
+    done = [r for r in results if r["status"] == "done"]
+    failures: dict = {}
+    for r in results:
+        if r["status"] != "done":
+            key = r["errorClass"] or r["status"] or "unknown"
+            failures[key] = failures.get(key, 0) + 1
+    seconds = [r["seconds"] for r in done]
+    p50 = _percentile(seconds, 50)
+    p95 = _percentile(seconds, 95)
+    total_bytes = sum(r["bytes"] for r in done)
+    return {
+        "concurrency": concurrency,
+        "jobs": len(results),
+        "done": len(done),
+        "failures": failures,
+        "wallSeconds": round(wall, 3),
+        "timeToDoneMs": {
+            "p50": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95": round(p95 * 1000, 1) if p95 is not None else None,
+            "max": round(max(seconds) * 1000, 1) if seconds else None,
+        },
+        "throughputBps": int(total_bytes / wall) if wall > 0 else None,
+        "cpuMsPerJob": round(cpu / len(results) * 1000, 2),
+        "accelaCpuMsPerJob": round(accela_cpu / len(results) * 1000, 2),
+        "retried": len(retried) if config["retry_check"] else None,
+    }
+
+
+def _ignore(self, message) -> None:
+    pass
+
+
+def _measure(level: int, mock: MockApi, port: int, args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="cyberia-bench-") as workdir:
+        backend = _prepare_backend(workdir, port, args)
+        config = {
+            "backend": backend,
+            "concurrency": level,
+            "rounds": args.rounds,
+            "appid_base": APPID_BASE + level * 100_000,
+            "retry_check": args.retry_check,
+        }
+        mock.reset_counts()
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)],
+            capture_output=True,
+            text=True,
+        )
+    if proc.returncode != 0:
+        raise SystemExit(f"level {level} failed:\n{proc.stderr}")
+    # Only the last line is ours; a real PluginUtils may log to stdout.
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["repeated404s"] = mock.repeated_not_found() if args.retry_check else None
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--levels",
+        default="1,4,16",
+        help="comma separated concurrent start_add_via_cyberia calls per round",
+    )
+    parser.add_argument("--rounds", type=int, default=4, help="rounds per level")
+    parser.add_argument("--size", type=int, default=512 * 1024, help="zip bytes")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--not-found-ratio", type=float, default=0.1)
+    parser.add_argument("--html-ratio", type=float, default=0.05)
+    parser.add_argument("--drip-ratio", type=float, default=0.1)
+    parser.add_argument("--drip-chunks", type=int, default=16)
+    parser.add_argument("--drip-ms", type=float, default=50, help="delay per chunk")
+    parser.add_argument("--apis", type=int, default=2, help="mock APIs in api_list")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="max_concurrent_downloads (0 = backend default)",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--retry-check",
+        action="store_true",
+        help="re-add failed jobs and fail if an API is asked again after a 404",
+    )
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_level(json.loads(args.child))))
+        return
+
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    mock = MockApi(args)
+    server = _start_server(mock)
+    try:
+        results = [
+            _measure(level, mock, server.server_address[1], args) for level in levels
+        ]
+    finally:
+        server.shutdown()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("child", "output")
+        },
+        "levels": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    if any(level["repeated404s"] for level in results):
+        raise SystemExit("retry check failed: an API was asked again after a 404")
+
+
+if __name__ == "__main__":
+    main()
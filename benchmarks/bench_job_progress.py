@@ -0,0 +1,133 @@
+"""Microbenchmark: per-chunk bookkeeping cost of the download loop.
+
+Compares the old dict-under-lock progress tracking (two cancellation checks,
+one state copy and one state update per chunk) with the DownloadJob hot path
+(an Event flag read and a plain counter bump). A background thread polls the
+status the way the frontends do, so lock contention is part of the picture.
+
+Usage: python benchmarks/bench_job_progress.py [--chunks N] [--poll-hz HZ]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def _ignore(self, message) -> None:
+    pass
+
+
+if importlib.util.find_spec("PluginUtils") is None:
+    # Outside Steam there is no host logger; keep the backend quiet.
+    _shim = types.ModuleType("PluginUtils")
+    _shim.Logger = type(
+        "Logger", (), {"log": _ignore, "warn": _ignore, "error": _ignore}
+    )
+    sys.modules["PluginUtils"] = _shim
+
+from jobs import DownloadJob  # noqa: E402
+
+CHUNK = b"\0" * 65536
+
+
+def _legacy_loop(chunks: int, stop: threading.Event, poll_hz: float) -> float:
+    state_table = {1: {"status": "downloading", "bytesRead": 0, "totalBytes": 0}}
+    lock = threading.Lock()
+
+    def set_state(appid, update):
+        with lock:
+            state = state_table.get(appid) or {}
+            state.update(update)
+            state_table[appid] = state
+
+    def get_state(appid):
+        with lock:
+            return state_table.get(appid, {}).copy()
+
+    def is_cancelled(appid):
+        return get_state(appid).get("status") == "cancelled"
+
+    poller = _start_poller(lambda: get_state(1), stop, poll_hz)
+    start = time.perf_counter()
+    for _ in range(chunks):
+        if is_cancelled(1):
+            raise RuntimeError("cancelled")
+        state = get_state(1)
+        set_state(1, {"bytesRead": int(state.get("bytesRead", 0)) + len(CHUNK)})
+        if is_cancelled(1):
+            raise RuntimeError("cancelled")
+    elapsed = time.perf_counter() - start
+    stop.set()
+    poller.join()
+    return elapsed
+
+
+def _job_loop(chunks: int, stop: threading.Event, poll_hz: float) -> float:
+    job = DownloadJob(1, status="downloading")
+    cancel_event = job.cancel_event
+
+    poller = _start_poller(job.snapshot, stop, poll_hz)
+    start = time.perf_counter()
+    for _ in range(chunks):
+        if cancel_event.is_set():
+            raise RuntimeError("cancelled")
+        job.bytes_read += len(CHUNK)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    poller.join()
+    return elapsed
+
+
+def _start_poller(read_status, stop: threading.Event, poll_hz: float):
+    interval = 1.0 / poll_hz if poll_hz > 0 else None
+
+    def run():
+        while not stop.is_set():
+            json.dumps(read_status())
+            if interval is not None:
+                stop.wait(interval)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument(
+        "--poll-hz",
+        type=float,
+        default=0,
+        help="status polls per second from a second thread (0 = busy poll)",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name, loop in (("legacy_dict_lock", _legacy_loop), ("download_job", _job_loop)):
+        elapsed = loop(args.chunks, threading.Event(), args.poll_hz)
+        results[name] = {
+            "seconds": round(elapsed, 4),
+            "ns_per_chunk": round(elapsed / args.chunks * 1e9, 1),
+        }
+    results["speedup"] = round(
+        results["legacy_dict_lock"]["seconds"] / results["download_job"]["seconds"], 2
+    )
+    print(
+        json.dumps(
+            {"chunks": args.chunks, "poll_hz": args.poll_hz, **results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,17 @@
 
     var React__namespace = /*#__PURE__*/_interopNamespaceDefault(React);
 
+    // "1.2 MB/s, 8s left" for a downloading job, or null before the first estimate.
+    function formatTransfer(status) {
+        if (status.stalled)
+            return "Stalled, waiting for data...";
+        if (!status.speedBps)
+            return null;
+        let text = `${(status.speedBps / (1024 * 1024)).toFixed(1)} MB/s`;
+        if (status.etaSeconds != null)
+            text += `, ${Math.ceil(status.etaSeconds)}s left`;
+        return text;
+    }
     // Content for the main cyberia functionality
     function CyberiaContent({ serverAPI }) {
         const [appStore, setAppStore] = React.useState(null);
@@ -86,14 +97,24 @@
                 backendLog("Error starting download: " + err);
             }
         };
-        const getAddStatus = async (appid) => {
+        // Resolves with the seq to wait on next, or null if the call failed.
+        const waitAddStatus = async (appid, sinceSeq) => {
             try {
-                const response = await serverAPI.callPluginMethod("get_add_status", { appid });
+                const response = await serverAPI.callPluginMethod("wait_add_status", {
+                    appid,
+                    since_seq: sinceSeq,
+                    timeout: 10,
+                });
                 const data = JSON.parse(response.result || "{}");
-                setDownloadStatus(data);
+                if (!data.success)
+                    return null;
+                if (data.changed)
+                    setDownloadStatus(data);
+                return data.seq;
             }
             catch (err) {
                 backendLog("Error getting status: " + err);
+                return null;
             }
         };
         const cancelAddViaCyberia = async (appid) => {
@@ -147,14 +168,28 @@
                 loadSettings();
             }
         }, [showSettings]);
-        // Poll for download status when in progress
+        // Long-poll for download status when in progress; the backend answers as
+        // soon as the job changes, so there is no fixed polling interval.
         React.useEffect(() => {
             if (!isInProgress || !currentAppId)
                 return;
-            const interval = setInterval(() => {
-                getAddStatus(currentAppId);
-            }, 1000);
-            return () => clearInterval(interval);
+            let active = true;
+            const poll = async () => {
+                let sinceSeq = 0;
+                while (active) {
+                    const seq = await waitAddStatus(currentAppId, sinceSeq);
+                    if (seq === null) {
+                        await new Promise((resolve) => setTimeout(resolve, 1000));
+                    }
+                    else {
+                        sinceSeq = seq;
+                    }
+                }
+            };
+            poll();
+            return () => {
+                active = false;
+            };
         }, [isInProgress, currentAppId]);
         // Check if operation is complete
         React.useEffect(() => {
@@ -308,6 +343,7 @@
                     React__namespace.createElement("p", null,
                         "Status: ",
                         downloadStatus.status || 'In progress...'),
+                    downloadStatus.state?.status === 'downloading' && formatTransfer(downloadStatus.state) && (React__namespace.createElement("p", null, formatTransfer(downloadStatus.state))),
                     downloadStatus.progress !== undefined && (React__namespace.createElement("div", { className: "cyberia-progress-bar" },
                         React__namespace.createElement("div", { className: "cyberia-progress-fill", style: { width: `${downloadStatus.progress}%` } }))),
                     downloadStatus.message && (React__namespace.createElement("p", null, downloadStatus.message)),
@@ -9,7 +9,22 @@ from decky import plugin
 
 # Import existing backend modules
 sys.path.append(os.path.join(plugin.PLUGIN_DIR, "backend"))
-from downloads import start_add_via_cyberia, get_add_status, cancel_add_via_cyberia
+from downloads import (
+    start_add_via_cyberia,
+    get_add_status,
+    get_all_statuses,
+    cancel_add_via_cyberia,
+    get_api_stats,
+    start_add_batch,
+    get_batch_status,
+    get_history,
+    get_download_rate_limit,
+    recover_jobs,
+    set_download_rate_limit,
+    stop_downloads,
+    wait_add_status,
+    wait_for_downloads,
+)
 from settings import load_settings, save_settings
 from slsonline import (
     check_fake_app_id,
@@ -17,7 +32,16 @@ from slsonline import (
     get_status_config,
     save_status_config,
 )
+from accela import refresh_accela
 from http_client import close_http_client
+from job_store import close_job_store
+from prewarm import start_prewarm
+from scheduler import PRIORITY_NORMAL
+from config import (
+    DOWNLOAD_SHUTDOWN_WAIT_SECONDS,
+    HISTORY_DEFAULT_LIMIT,
+    STATUS_WAIT_DEFAULT_SECONDS,
+)
 from logger import logger as shared_logger
 
 logger = shared_logger
@@ -36,11 +60,30 @@ class Plugin:
         except Exception as e:
             logger.error(f"Failed to initialize temp directories: {e}")
 
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, recover_jobs)
+        except Exception as e:
+            logger.error(f"Failed to recover interrupted jobs: {e}")
+
+        try:
+            # Runs on its own thread; startup does not wait for it.
+            start_prewarm()
+        except Exception as e:
+            logger.error(f"Failed to start connection warm-up: {e}")
+
     async def _unload(self):
         """Cleanup when plugin is unloaded."""
         logger.log("Cyberia plugin unloading")
         try:
-            close_http_client("InitApis")
+            loop = asyncio.get_running_loop()
+            stop_downloads()
+            # Waits for open requests to drain; keep the event loop free.
+            await loop.run_in_executor(None, close_http_client, "InitApis")
+            # Workers still record their final status; close the store after.
+            await loop.run_in_executor(
+                None, wait_for_downloads, DOWNLOAD_SHUTDOWN_WAIT_SECONDS
+            )
+            close_job_store()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
 
@@ -49,16 +92,70 @@ class Plugin:
         try:
             if method_name == "start_add_via_cyberia":
                 appid = args[0] if args else kwargs.get("appid")
-                return start_add_via_cyberia(appid)
+                priority = (
+                    args[1] if len(args) > 1 else kwargs.get("priority", PRIORITY_NORMAL)
+                )
+                rate_limit = args[2] if len(args) > 2 else kwargs.get("rate_limit")
+                return start_add_via_cyberia(appid, priority, rate_limit)
+
+            elif method_name == "start_add_batch":
+                appids = args[0] if args else kwargs.get("appids")
+                priority = (
+                    args[1] if len(args) > 1 else kwargs.get("priority", PRIORITY_NORMAL)
+                )
+                return start_add_batch(appids, priority)
+
+            elif method_name == "get_batch_status":
+                batch_id = args[0] if args else kwargs.get("batch_id")
+                return get_batch_status(batch_id)
 
             elif method_name == "get_add_status":
                 appid = args[0] if args else kwargs.get("appid")
                 return get_add_status(appid)
 
+            elif method_name == "wait_add_status":
+                appid = args[0] if args else kwargs.get("appid")
+                since_seq = args[1] if len(args) > 1 else kwargs.get("since_seq", 0)
+                timeout = (
+                    args[2]
+                    if len(args) > 2
+                    else kwargs.get("timeout", STATUS_WAIT_DEFAULT_SECONDS)
+                )
+                # Blocks for up to the timeout; keep the event loop free meanwhile.
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, wait_add_status, appid, since_seq, timeout
+                )
+
+            elif method_name == "get_all_statuses":
+                since_seq = args[0] if args else kwargs.get("since_seq", 0)
+                return get_all_statuses(since_seq)
+
+            elif method_name == "get_history":
+                limit = args[0] if args else kwargs.get("limit", HISTORY_DEFAULT_LIMIT)
+                return get_history(limit)
+
             elif method_name == "cancel_add_via_cyberia":
                 appid = args[0] if args else kwargs.get("appid")
                 return cancel_add_via_cyberia(appid)
 
+            elif method_name == "get_api_stats":
+                return get_api_stats()
+
+            elif method_name == "get_download_rate_limit":
+                return get_download_rate_limit()
+
+            elif method_name == "set_download_rate_limit":
+                rate_bps = args[0] if args else kwargs.get("rate_bps")
+                burst_bytes = args[1] if len(args) > 1 else kwargs.get("burst_bytes")
+                appid = args[2] if len(args) > 2 else kwargs.get("appid")
+                return set_download_rate_limit(rate_bps, burst_bytes, appid)
+
+            elif method_name == "refresh_accela":
+                # May run pip show and pip install; keep the event loop free.
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, refresh_accela
+                )
+
             elif method_name == "get_settings":
                 settings = load_settings()
                 return json.dumps({"success": True, "settings": settings})
@@ -1167,22 +1167,28 @@
     true,
   );
 
-  // Poll backend for operation progress and update UI
+  // Long-poll backend for operation progress and update UI. Each call returns
+  // as soon as the job changes (or after the timeout), then the next one starts.
+  // Millennium handles backend calls inline, so the wait is kept short enough
+  // not to hold up a Cancel queued behind it.
   function startPolling(appid) {
     let done = false;
-    const timer = setInterval(() => {
-      if (done) {
-        clearInterval(timer);
-        return;
-      }
+    let sinceSeq = 0;
+    const tick = () => {
+      if (done) return;
       try {
-        Millennium.callServerMethod("cyberia", "GetAddViaCyberiaStatus", {
+        Millennium.callServerMethod("cyberia", "WaitAddViaCyberiaStatus", {
           appid,
+          since_seq: sinceSeq,
+          timeout: 1,
           contentScriptQuery: "",
         }).then((res) => {
+          let ok = false;
           try {
             const payload = typeof res === "string" ? JSON.parse(res) : res;
             const st = payload && payload.state ? payload.state : {};
+            ok = !!(payload && payload.success);
+            if (ok && typeof payload.seq === "number") sinceSeq = payload.seq;
 
             // Try to find overlay (may or may not be visible)
             const overlay = document.querySelector(".cyberia-overlay");
@@ -1214,8 +1220,17 @@
                   "{api}",
                   st.currentApi,
                 );
-              if (st.status === "downloading")
-                status.textContent = "Downloading…";
+              if (st.status === "downloading") {
+                let text = "Downloading…";
+                if (st.stalled) text = "Stalled, waiting for data…";
+                else if (st.speedBps) {
+                  text +=
+                    " " + (st.speedBps / (1024 * 1024)).toFixed(1) + " MB/s";
+                  if (st.etaSeconds != null)
+                    text += ", " + Math.ceil(st.etaSeconds) + "s left";
+                }
+                status.textContent = text;
+              }
               if (st.status === "processing")
                 status.textContent = "Processing package…";
               if (st.status === "installing")
@@ -1267,7 +1282,6 @@
                 }, 300);
               }
               done = true;
-              clearInterval(timer);
               runState.inProgress = false;
               runState.appid = null;
               // remove only the Enter Cyberia download button since game is added (works even if popup is hidden)
@@ -1301,16 +1315,17 @@
               if (wrap) wrap.style.display = "none";
               if (percent) percent.style.display = "none";
               done = true;
-              clearInterval(timer);
               runState.inProgress = false;
               runState.appid = null;
             }
           } catch (_) {}
+          if (!done) setTimeout(tick, ok ? 0 : 1000);
+        }).catch(() => {
+          if (!done) setTimeout(tick, 1000);
         });
-      } catch (_) {
-        clearInterval(timer);
-      }
-    }, 300);
+      } catch (_) {}
+    };
+    tick();
   }
 
   // Also try after delays to catch dynamically loaded content
@@ -6,6 +6,15 @@ interface ServerAPI {
 }
 import { useEffect, useState } from "react";
 
+// "1.2 MB/s, 8s left" for a downloading job, or null before the first estimate.
+function formatTransfer(status: any): string | null {
+  if (status.stalled) return "Stalled, waiting for data...";
+  if (!status.speedBps) return null;
+  let text = `${(status.speedBps / (1024 * 1024)).toFixed(1)} MB/s`;
+  if (status.etaSeconds != null) text += `, ${Math.ceil(status.etaSeconds)}s left`;
+  return text;
+}
+
 // Content for the main cyberia functionality
 function CyberiaContent({ serverAPI }: { serverAPI: ServerAPI }) {
   const [appStore, setAppStore] = useState<any>(null);
@@ -78,13 +87,21 @@ function CyberiaContent({ serverAPI }: { serverAPI: ServerAPI }) {
     }
   };
 
-  const getAddStatus = async (appid: number) => {
+  // Resolves with the seq to wait on next, or null if the call failed.
+  const waitAddStatus = async (appid: number, sinceSeq: number) => {
     try {
-      const response = await serverAPI.callPluginMethod("get_add_status", { appid });
+      const response = await serverAPI.callPluginMethod("wait_add_status", {
+        appid,
+        since_seq: sinceSeq,
+        timeout: 10,
+      });
       const data = JSON.parse(response.result || "{}");
-      setDownloadStatus(data);
+      if (!data.success) return null;
+      if (data.changed) setDownloadStatus(data);
+      return data.seq as number;
     } catch (err) {
       backendLog("Error getting status: " + err);
+      return null;
     }
   };
 
@@ -145,15 +162,28 @@ function CyberiaContent({ serverAPI }: { serverAPI: ServerAPI }) {
     }
   }, [showSettings]);
 
-  // Poll for download status when in progress
+  // Long-poll for download status when in progress; the backend answers as
+  // soon as the job changes, so there is no fixed polling interval.
   useEffect(() => {
     if (!isInProgress || !currentAppId) return;
 
-    const interval = setInterval(() => {
-      getAddStatus(currentAppId);
-    }, 1000);
+    let active = true;
+    const poll = async () => {
+      let sinceSeq = 0;
+      while (active) {
+        const seq = await waitAddStatus(currentAppId, sinceSeq);
+        if (seq === null) {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+        } else {
+          sinceSeq = seq;
+        }
+      }
+    };
+    poll();
 
-    return () => clearInterval(interval);
+    return () => {
+      active = false;
+    };
   }, [isInProgress, currentAppId]);
 
   // Check if operation is complete
@@ -332,6 +362,10 @@ function CyberiaContent({ serverAPI }: { serverAPI: ServerAPI }) {
             </div>
             
             <p>Status: {downloadStatus.status || 'In progress...'}</p>
+
+            {downloadStatus.state?.status === 'downloading' && formatTransfer(downloadStatus.state) && (
+              <p>{formatTransfer(downloadStatus.state)}</p>
+            )}
             
             {downloadStatus.progress !== undefined && (
               <div className="cyberia-progress-bar">